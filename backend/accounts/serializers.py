@@ -12,7 +12,8 @@ class UserSerializer(serializers.ModelSerializer):
 class OrganizationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Organization
-        fields = ["id","name","org_code","country_code","currency","address","trade_register","tax_id","tax_enabled","default_tax_rate","whatsapp_number"]
+        fields = ["id","name","org_code","country_code","currency","address","trade_register","tax_id","tax_enabled","default_tax_rate","whatsapp_number","whatsapp_phone_number_id","whatsapp_access_token","valuation_method","archive_after_months"]
+        extra_kwargs = {"whatsapp_access_token": {"write_only": True}}
 
 class MembershipSerializer(serializers.ModelSerializer):
     class Meta:
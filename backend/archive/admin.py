@@ -0,0 +1,3 @@
+from django.contrib import admin
+from .models import ArchiveSegment
+admin.site.register(ArchiveSegment)
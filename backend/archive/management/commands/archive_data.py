@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.models import Organization
+from core.utils import parse_day
+from billing.models import Invoice, InvoiceLine
+from inventory.models import StockMovement
+from archive.services import archive_invoices, archive_movements, horizon
+
+def probe(org):
+    """Hot-table sizes and the latency of a typical list count and revenue aggregate."""
+    start = time.perf_counter()
+    invoices = Invoice.objects.filter(organization=org).count()
+    revenue = (InvoiceLine.objects.filter(invoice__organization=org)
+               .aggregate(s=Sum(F("quantity") * F("unit_price")))["s"])
+    movements = StockMovement.objects.filter(organization=org).count()
+    return {"invoices": invoices, "movements": movements, "revenue": revenue,
+            "ms": (time.perf_counter() - start) * 1000}
+
+class Command(BaseCommand):
+    help = "Archive les factures payées et mouvements de stock antérieurs à l'horizon de rétention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", help="org_code (toutes les organisations avec rétention par défaut)")
+        parser.add_argument("--before", help="YYYY-MM-DD : remplace l'horizon calculé (archive_after_months)")
+        parser.add_argument("--only", choices=["invoices", "movements"])
+
+    def handle(self, *args, **opts):
+        orgs = Organization.objects.all()
+        if opts["org"]:
+            orgs = orgs.filter(org_code=opts["org"])
+            if not orgs.exists():
+                raise CommandError(f"Organisation inconnue : {opts['org']}")
+        elif not opts["before"]:
+            orgs = orgs.filter(archive_after_months__gt=0)
+        before = parse_day(opts["before"]) if opts["before"] else None
+        if opts["before"] and before is None:
+            raise CommandError("Date invalide, format attendu YYYY-MM-DD.")
+        if before is not None and before > timezone.localdate():
+            raise CommandError("--before ne peut pas être postérieur à aujourd'hui.")
+
+        for org in orgs:
+            cutoff = before or horizon(org)
+            if cutoff is None:
+                self.stdout.write(f"{org.org_code}: archivage désactivé")
+                continue
+            ahead = probe(org)
+            segments = []
+            if opts["only"] != "movements":
+                segments += archive_invoices(org, cutoff)
+            if opts["only"] != "invoices":
+                segments += archive_movements(org, cutoff)
+            after = probe(org)
+            rows = sum(s.row_count for s in segments)
+            size = sum(s.byte_size for s in segments)
+            self.stdout.write(f"{org.org_code}: {len(segments)} segment(s), {rows} ligne(s), {size / 1024:.0f} Kio avant le {cutoff:%Y-%m-%d}")
+            self.stdout.write(f"  factures {ahead['invoices']} -> {after['invoices']}, mouvements {ahead['movements']} -> {after['movements']}, "
+                              f"requête type {ahead['ms']:.1f} ms -> {after['ms']:.1f} ms")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.models import ArchiveSegment
+from archive.services import restore_segment
+from core.utils import parse_day
+
+class Command(BaseCommand):
+    help = "Réintègre des segments archivés dans les tables actives."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--segment", type=int, action="append", help="Identifiant de segment (répétable)")
+        parser.add_argument("--org", help="org_code")
+        parser.add_argument("--kind", choices=[k for k, _ in ArchiveSegment.KIND_CHOICES])
+        parser.add_argument("--from", dest="since", help="YYYY-MM-DD : segments à partir de ce mois")
+        parser.add_argument("--to", help="YYYY-MM-DD : segments jusqu'à ce mois")
+
+    def handle(self, *args, **opts):
+        since = parse_day(opts["since"]) if opts["since"] else None
+        until = parse_day(opts["to"]) if opts["to"] else None
+        if (opts["since"] and since is None) or (opts["to"] and until is None):
+            raise CommandError("Date invalide, format attendu YYYY-MM-DD.")
+        qs = ArchiveSegment.objects.select_related("organization").order_by("period", "id")
+        if opts["segment"]:
+            qs = qs.filter(id__in=opts["segment"])
+        elif not opts["org"]:
+            raise CommandError("Indiquez --segment ou --org.")
+        if opts["org"]:
+            qs = qs.filter(organization__org_code=opts["org"])
+        if opts["kind"]:
+            qs = qs.filter(kind=opts["kind"])
+        if since:
+            qs = qs.filter(period__gte=since.replace(day=1))
+        if until:
+            qs = qs.filter(period__lte=until)
+        for segment in qs:
+            try:
+                n = restore_segment(segment)
+            except ValueError as exc:
+                raise CommandError(f"Segment {segment.id} : {exc}")
+            self.stdout.write(f"{segment.organization.org_code}: {segment.kind} {segment.period:%Y-%m} -> {n} ligne(s) restaurée(s)")
@@ -0,0 +1,47 @@
+from django.db import models
+from core.models import OrgScopedModel
+from products.models import Product
+
+class ArchiveSegment(OrgScopedModel):
+    # One gzip JSONL file of cold rows for an org, a kind and a month (see archive/store.py).
+    INVOICES, MOVEMENTS = "INVOICES","MOVEMENTS"
+    KIND_CHOICES = [(INVOICES,"INVOICES"),(MOVEMENTS,"MOVEMENTS")]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    period = models.DateField()  # first day of the month
+    path = models.CharField(max_length=500)
+    row_count = models.PositiveIntegerField(default=0)
+    byte_size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64)  # sha256 of the file
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=["organization","kind","period"])]
+    def __str__(self):
+        return f"{self.kind} {self.period:%Y-%m} ({self.row_count})"
+
+# Rollups stay in the database so reports can cover archived months without opening segments.
+# They hang off their segment: restoring it deletes them.
+
+class InvoiceRollup(OrgScopedModel):
+    segment = models.ForeignKey(ArchiveSegment, related_name="invoice_rollups", on_delete=models.CASCADE)
+    month = models.DateField()
+    status = models.CharField(max_length=20)
+    invoice_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)  # sum(quantity * unit_price)
+    paid_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+class ProductSalesRollup(OrgScopedModel):
+    segment = models.ForeignKey(ArchiveSegment, related_name="product_rollups", on_delete=models.CASCADE)
+    month = models.DateField()
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL)
+    product_name = models.CharField(max_length=255, blank=True)
+    quantity = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+class MovementRollup(OrgScopedModel):
+    segment = models.ForeignKey(ArchiveSegment, related_name="movement_rollups", on_delete=models.CASCADE)
+    month = models.DateField()
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL)
+    movement_count = models.PositiveIntegerField(default=0)
+    quantity_in = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    quantity_out = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    quantity_adjust = models.DecimalField(max_digits=18, decimal_places=2, default=0)
@@ -0,0 +1,255 @@
+"""Moves closed history (paid invoices, old stock movements) to segment files and back."""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from billing.models import Customer, Invoice, InvoiceLine, Payment, Quote, RecurringInvoice
+from billing.recurring import add_months
+from inventory.models import StockMovement
+from inventory.valuation import METHODS, build_checkpoints, end_of_day
+from products.models import Product, Tax
+
+from .models import ArchiveSegment, InvoiceRollup, MovementRollup, ProductSalesRollup
+from .store import read_segment, segment_path, verify_segment, write_segment
+
+CHUNK = 1000
+
+logger = logging.getLogger(__name__)
+
+def horizon(org, today=None):
+    """First day of the oldest month kept hot, or None when archiving is disabled."""
+    if not org.archive_after_months:
+        return None
+    today = today or timezone.localdate()
+    return add_months(today.replace(day=1), -org.archive_after_months)
+
+def _chunks(ids, size=CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _delete(model, ids):
+    deleted = 0
+    for chunk in _chunks(ids):
+        deleted += model.objects.filter(id__in=chunk).delete()[1].get(model._meta.label, 0)
+    return deleted
+
+class _Changed(Exception):
+    pass
+
+def _commit_segment(org, kind, period, path, rows, make_rollups, model, ids, lock):
+    """Writes, registers and deletes one segment's rows in a single transaction; None if they changed meanwhile.
+
+    `lock(chunk)` locks a chunk of rows (and their children) and returns how many still qualify, so a row
+    edited between reading `ids` and archiving it is never deleted with a stale copy in the file.
+    """
+    try:
+        with transaction.atomic():
+            if sum(lock(chunk) for chunk in _chunks(ids)) != len(ids):
+                raise _Changed
+            count, size, checksum = write_segment(path, rows)
+            segment = ArchiveSegment.objects.create(organization=org, kind=kind, period=period, path=str(path),
+                                                    row_count=count, byte_size=size, checksum=checksum)
+            make_rollups(segment)
+            if _delete(model, ids) != count:
+                raise _Changed
+    except _Changed:
+        path.unlink(missing_ok=True)
+        logger.warning("%s : lignes %s de %s modifiées pendant l'archivage ; segment reporté au prochain passage.",
+                       org.org_code, kind, f"{period:%Y-%m}")
+        return None
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return segment
+
+# --- invoices -----------------------------------------------------------------------------
+
+def archivable_invoices(org, before):
+    return Invoice.objects.filter(organization=org, status="PAID", issue_date__lt=before)
+
+def _invoice_rows(ids, totals, products):
+    for chunk in _chunks(ids):
+        qs = (Invoice.objects.filter(id__in=chunk).select_related("customer")
+              .prefetch_related("lines__product", "payments").order_by("issue_date", "id"))
+        for inv in qs:
+            lines = list(inv.lines.all())
+            payments = list(inv.payments.all())
+            t = totals[inv.status]
+            t["count"] += 1
+            t["paid"] += sum((p.amount for p in payments), Decimal(0))
+            for line in lines:
+                amount = line.quantity * line.unit_price
+                t["revenue"] += amount
+                p = products[line.product_id]
+                p["name"] = line.product.name if line.product else ""
+                p["quantity"] += line.quantity
+                p["revenue"] += amount
+            yield {
+                "id": inv.id, "number": inv.number, "customer_id": inv.customer_id, "customer_name": inv.customer.name,
+                "issue_date": inv.issue_date, "due_date": inv.due_date, "currency": inv.currency,
+                "quote_id": inv.quote_id, "recurring_id": inv.recurring_id, "status": inv.status,
+                "lines": [{"id": l.id, "product_id": l.product_id, "description": l.description, "quantity": l.quantity,
+                           "unit_price": l.unit_price, "tax_id": l.tax_id} for l in lines],
+                "payments": [{"id": p.id, "amount": p.amount, "method": p.method, "paid_at": p.paid_at} for p in payments],
+            }
+
+def archive_invoices(org, before):
+    """Archives paid invoices issued before `before`, one segment per month."""
+    created = []
+    for period in archivable_invoices(org, before).dates("issue_date", "month"):
+        end = min(add_months(period, 1), before)
+        ids = list(archivable_invoices(org, before).filter(issue_date__gte=period, issue_date__lt=end)
+                   .order_by("issue_date", "id").values_list("id", flat=True))
+        totals = defaultdict(lambda: {"count": 0, "revenue": Decimal(0), "paid": Decimal(0)})
+        products = defaultdict(lambda: {"name": "", "quantity": Decimal(0), "revenue": Decimal(0)})
+        def rollups(segment):
+            InvoiceRollup.objects.bulk_create([
+                InvoiceRollup(organization=org, segment=segment, month=period, status=status, invoice_count=t["count"],
+                              revenue=t["revenue"], paid_total=t["paid"])
+                for status, t in totals.items()
+            ])
+            ProductSalesRollup.objects.bulk_create([
+                ProductSalesRollup(organization=org, segment=segment, month=period, product_id=pid,
+                                   product_name=p["name"], quantity=p["quantity"], revenue=p["revenue"])
+                for pid, p in products.items()
+            ])
+        def lock(chunk, period=period, end=end):
+            still = list(archivable_invoices(org, before).select_for_update()
+                         .filter(id__in=chunk, issue_date__gte=period, issue_date__lt=end).values_list("id", flat=True))
+            # New lines or payments need the invoice row; existing ones are locked so they can't be edited.
+            list(InvoiceLine.objects.select_for_update().filter(invoice_id__in=chunk).values_list("id", flat=True))
+            list(Payment.objects.select_for_update().filter(invoice_id__in=chunk).values_list("id", flat=True))
+            return len(still)
+        path = segment_path(org, ArchiveSegment.INVOICES, period)
+        segment = _commit_segment(org, ArchiveSegment.INVOICES, period, path,
+                                  _invoice_rows(ids, totals, products), rollups, Invoice, ids, lock)
+        if segment is not None:
+            created.append(segment)
+    return created
+
+# --- stock movements ----------------------------------------------------------------------
+
+def _movement_rows(ids, rollup):
+    # Same (product, occurred_at, id) order as the valuation stream, so segments can be merged back in.
+    for chunk in _chunks(ids):
+        for m in StockMovement.objects.filter(id__in=chunk).order_by("product_id", "occurred_at", "id"):
+            r = rollup[m.product_id]
+            r["count"] += 1
+            r[m.mov_type] += m.quantity
+            yield {"id": m.id, "product_id": m.product_id, "mov_type": m.mov_type, "quantity": m.quantity,
+                   "unit_cost": m.unit_cost, "ref": m.ref, "occurred_at": m.occurred_at}
+
+def archive_movements(org, before):
+    """Archives movements that occurred before `before` (a date), after pinning valuation checkpoints there."""
+    cutoff = end_of_day(before - timedelta(days=1))
+    if cutoff > timezone.now():
+        # A checkpoint pinned in the future would hide every movement recorded until then from valuation.
+        raise ValueError(f"Horizon d'archivage dans le futur : {before:%Y-%m-%d}")
+    qs = StockMovement.objects.filter(organization=org, occurred_at__lte=cutoff)
+    if not qs.exists():
+        return []
+    # Valuations after the horizon must not need the cold rows.
+    for method in METHODS:
+        build_checkpoints(org, [cutoff], method=method)
+    created = []
+    for period in qs.dates("occurred_at", "month"):
+        end = min(add_months(period, 1), before)
+        start_dt = timezone.make_aware(datetime.combine(period, time.min))
+        ids = list(qs.filter(occurred_at__gte=start_dt, occurred_at__lte=end_of_day(end - timedelta(days=1)))
+                   .order_by("product_id", "occurred_at", "id").values_list("id", flat=True))
+        rollup = defaultdict(lambda: {"count": 0, StockMovement.IN: Decimal(0), StockMovement.OUT: Decimal(0), StockMovement.ADJUST: Decimal(0)})
+        def rollups(segment):
+            MovementRollup.objects.bulk_create([
+                MovementRollup(organization=org, segment=segment, month=period, product_id=pid, movement_count=r["count"],
+                               quantity_in=r[StockMovement.IN], quantity_out=r[StockMovement.OUT],
+                               quantity_adjust=r[StockMovement.ADJUST])
+                for pid, r in rollup.items()
+            ])
+        def lock(chunk, start_dt=start_dt, end=end):
+            return len(list(qs.select_for_update()
+                            .filter(id__in=chunk, occurred_at__gte=start_dt, occurred_at__lte=end_of_day(end - timedelta(days=1)))
+                            .values_list("id", flat=True)))
+        path = segment_path(org, ArchiveSegment.MOVEMENTS, period)
+        segment = _commit_segment(org, ArchiveSegment.MOVEMENTS, period, path,
+                                  _movement_rows(ids, rollup), rollups, StockMovement, ids, lock)
+        if segment is not None:
+            created.append(segment)
+    return created
+
+def archive_org(org, today=None):
+    before = horizon(org, today)
+    if before is None:
+        return []
+    return archive_invoices(org, before) + archive_movements(org, before)
+
+# --- restore ------------------------------------------------------------------------------
+
+def _existing(model, ids):
+    return set(model.objects.filter(id__in=ids).values_list("id", flat=True))
+
+def _restore_invoices(segment, rows):
+    org_id = segment.organization_id
+    customers = _existing(Customer, {r["customer_id"] for r in rows})
+    missing = {r["customer_name"] for r in rows if r["customer_id"] not in customers}
+    if missing:
+        raise ValueError(f"Clients supprimés depuis l'archivage : {', '.join(sorted(missing))}")
+    products = _existing(Product, {l["product_id"] for r in rows for l in r["lines"] if l["product_id"]})
+    taxes = _existing(Tax, {l["tax_id"] for r in rows for l in r["lines"] if l["tax_id"]})
+    quotes = _existing(Quote, {r["quote_id"] for r in rows if r["quote_id"]})
+    schedules = _existing(RecurringInvoice, {r["recurring_id"] for r in rows if r["recurring_id"]})
+    Invoice.objects.bulk_create([
+        Invoice(id=r["id"], organization_id=org_id, number=r["number"], customer_id=r["customer_id"],
+                issue_date=parse_date(r["issue_date"]), due_date=parse_date(r["due_date"]) if r["due_date"] else None,
+                currency=r["currency"], quote_id=r["quote_id"] if r["quote_id"] in quotes else None,
+                recurring_id=r["recurring_id"] if r["recurring_id"] in schedules else None, status=r["status"])
+        for r in rows
+    ], batch_size=CHUNK)
+    InvoiceLine.objects.bulk_create([
+        InvoiceLine(id=l["id"], invoice_id=r["id"], description=l["description"], quantity=Decimal(l["quantity"]),
+                    unit_price=Decimal(l["unit_price"]), product_id=l["product_id"] if l["product_id"] in products else None,
+                    tax_id=l["tax_id"] if l["tax_id"] in taxes else None)
+        for r in rows for l in r["lines"]
+    ], batch_size=CHUNK)
+    payments = [Payment(id=p["id"], invoice_id=r["id"], amount=Decimal(p["amount"]), method=p["method"])
+                for r in rows for p in r["payments"]]
+    Payment.objects.bulk_create(payments, batch_size=CHUNK)
+    # auto_now_add overwrote paid_at on insert; put the original timestamps back.
+    paid_at = {p["id"]: parse_datetime(p["paid_at"]) for r in rows for p in r["payments"]}
+    for p in payments:
+        p.paid_at = paid_at[p.id]
+    Payment.objects.bulk_update(payments, ["paid_at"], batch_size=CHUNK)
+
+def _restore_movements(segment, rows):
+    products = _existing(Product, {r["product_id"] for r in rows})
+    if len(products) != len({r["product_id"] for r in rows}):
+        raise ValueError("Articles supprimés depuis l'archivage ; restauration impossible.")
+    movements = [StockMovement(id=r["id"], organization_id=segment.organization_id, product_id=r["product_id"],
+                               mov_type=r["mov_type"], quantity=Decimal(r["quantity"]),
+                               unit_cost=Decimal(r["unit_cost"]) if r["unit_cost"] is not None else None, ref=r["ref"])
+                 for r in rows]
+    StockMovement.objects.bulk_create(movements, batch_size=CHUNK)
+    occurred_at = {r["id"]: parse_datetime(r["occurred_at"]) for r in rows}
+    for m in movements:
+        m.occurred_at = occurred_at[m.id]
+    StockMovement.objects.bulk_update(movements, ["occurred_at"], batch_size=CHUNK)
+
+def restore_segment(segment):
+    """Moves a segment's rows back into the hot tables and drops its file and rollups."""
+    if not verify_segment(segment):
+        raise ValueError(f"Somme de contrôle invalide pour {segment.path}")
+    rows = list(read_segment(segment.path))
+    path = Path(segment.path)
+    with transaction.atomic():
+        if segment.kind == ArchiveSegment.INVOICES:
+            _restore_invoices(segment, rows)
+        else:
+            _restore_movements(segment, rows)
+        segment.delete()
+        transaction.on_commit(lambda: path.unlink(missing_ok=True))
+    return len(rows)
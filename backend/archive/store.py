@@ -0,0 +1,96 @@
+"""Segment files: gzip-compressed JSON lines, written atomically and checksummed."""
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchiveSegment
+
+def segment_path(org, kind, period) -> Path:
+    name = f"{period:%Y-%m}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    return Path(settings.ARCHIVE_ROOT) / org.org_code / kind.lower() / name
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} non sérialisable")
+
+def write_segment(path: Path, rows):
+    """Writes rows to `path`; returns (row_count, byte_size, sha256)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+        for row in rows:
+            fh.write(json.dumps(row, default=_default, separators=(",", ":")))
+            fh.write("\n")
+            count += 1
+    digest = hashlib.sha256()
+    with open(tmp, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    os.replace(tmp, path)
+    return count, path.stat().st_size, digest.hexdigest()
+
+def verify_segment(segment) -> bool:
+    digest = hashlib.sha256()
+    with open(segment.path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest() == segment.checksum
+
+def read_segment(path):
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            yield json.loads(line)
+
+def segments(org, kind, start=None, end=None):
+    """Segments of `kind` whose month overlaps [start, end] (dates, either may be None)."""
+    qs = ArchiveSegment.objects.filter(kind=kind)
+    if org is not None:
+        qs = qs.filter(organization=org)
+    if start is not None:
+        qs = qs.filter(period__gte=start.replace(day=1))
+    if end is not None:
+        qs = qs.filter(period__lte=end)
+    return qs.order_by("period", "id")
+
+def iter_archived_invoices(org, start=None, end=None):
+    for segment in segments(org, ArchiveSegment.INVOICES, start, end):
+        for row in read_segment(segment.path):
+            issue_date = date.fromisoformat(row["issue_date"])
+            if (start is None or issue_date >= start) and (end is None or issue_date <= end):
+                yield row
+
+def _movement_rows(segment, after, until, product_ids):
+    for row in read_segment(segment.path):
+        if product_ids is not None and row["product_id"] not in product_ids:
+            continue
+        occurred_at = parse_datetime(row["occurred_at"])
+        if (after is not None and occurred_at <= after) or (until is not None and occurred_at > until):
+            continue
+        unit_cost = Decimal(row["unit_cost"]) if row["unit_cost"] is not None else None
+        yield (row["product_id"], occurred_at, row["mov_type"], Decimal(row["quantity"]), unit_cost)
+
+def archived_movement_streams(org, after=None, until=None, product_ids=None):
+    """One iterator per overlapping segment, each ordered by (product, occurred_at) like the hot query."""
+    wanted = set(product_ids) if product_ids is not None else None
+    # Day of the first instant after `after`: a checkpoint pinned at the end of a month then starts at the next
+    # month, instead of decompressing the whole previous segment only to discard every row.
+    start = timezone.localtime(after + timedelta(microseconds=1)).date() if after is not None else None
+    end = timezone.localtime(until).date() if until is not None else None
+    return [_movement_rows(s, after, until, wanted) for s in segments(org, ArchiveSegment.MOVEMENTS, start, end)]
+
+def merge_movements(*streams):
+    return heapq.merge(*streams, key=lambda row: (row[0], row[1]))
@@ -0,0 +1,8 @@
+from config.celery import app
+from core.models import Organization
+from .services import archive_org
+
+@app.task(ignore_result=True)
+def archive_cold_data():
+    for org in Organization.objects.filter(archive_after_months__gt=0).iterator():
+        archive_org(org)
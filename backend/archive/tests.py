@@ -0,0 +1,70 @@
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from billing.models import Customer, Invoice, InvoiceLine
+from core.models import Organization
+from inventory.models import ValuationCheckpoint
+from inventory.valuation import end_of_day
+from .models import ArchiveSegment
+from . import services
+from .services import archive_invoices, archive_movements
+from .store import archived_movement_streams
+
+class ArchivedMovementStreamTests(TestCase):
+    def setUp(self):
+        org = self.org = Organization.objects.create(name="Boutique", org_code="boutique")
+        for month in (1, 2):
+            ArchiveSegment.objects.create(organization=org, kind=ArchiveSegment.MOVEMENTS, period=date(2026, month, 1),
+                                          path=f"/nonexistent/2026-0{month}.jsonl.gz", row_count=1, byte_size=1, checksum="")
+
+    def test_checkpoint_at_month_end_skips_that_month(self):
+        self.assertEqual(archived_movement_streams(self.org, after=end_of_day(date(2026, 2, 28))), [])
+        self.assertEqual(len(archived_movement_streams(self.org, after=end_of_day(date(2026, 1, 31)))), 1)
+
+    def test_checkpoint_mid_month_keeps_that_month(self):
+        self.assertEqual(len(archived_movement_streams(self.org, after=end_of_day(date(2026, 2, 14)))), 1)
+
+class ArchiveHorizonTests(TestCase):
+    def test_future_horizon_is_rejected(self):
+        org = Organization.objects.create(name="Boutique", org_code="boutique")
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with self.assertRaises(ValueError):
+            archive_movements(org, tomorrow + timedelta(days=1))
+        with self.assertRaises(CommandError):
+            call_command("archive_data", org="boutique", before=f"{tomorrow:%Y-%m-%d}")
+        self.assertFalse(ValuationCheckpoint.objects.exists())
+
+class ArchiveInvoicesTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.enterContext(override_settings(ARCHIVE_ROOT=self.tmp.name))
+        self.org = Organization.objects.create(name="Boutique", org_code="boutique")
+        customer = Customer.objects.create(organization=self.org, name="Client")
+        self.invoice = Invoice.objects.create(organization=self.org, customer=customer, number="FAC-1",
+                                              issue_date=date(2025, 1, 10), status="PAID")
+        InvoiceLine.objects.create(invoice=self.invoice, description="Riz", quantity=2, unit_price=500)
+
+    def test_archives_and_deletes_paid_invoices(self):
+        segments = archive_invoices(self.org, date(2025, 2, 1))
+        self.assertEqual([s.row_count for s in segments], [1])
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_invoice_changed_before_commit_is_kept_hot(self):
+        original = services._commit_segment
+        def reopen_then_commit(*args, **kwargs):
+            Invoice.objects.filter(pk=self.invoice.pk).update(status="SENT")
+            return original(*args, **kwargs)
+        with mock.patch.object(services, "_commit_segment", side_effect=reopen_then_commit), \
+                self.assertLogs("archive.services", "WARNING"):
+            self.assertEqual(archive_invoices(self.org, date(2025, 2, 1)), [])
+        self.assertTrue(Invoice.objects.filter(pk=self.invoice.pk, status="SENT").exists())
+        self.assertEqual(InvoiceLine.objects.count(), 1)
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertEqual(list(Path(self.tmp.name).rglob("*.gz")), [])
@@ -1,9 +1,112 @@
 from django.contrib import admin
-from .models import Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate
-admin.site.register(Customer)
-admin.site.register(Quote)
-admin.site.register(QuoteLine)
-admin.site.register(Invoice)
-admin.site.register(InvoiceLine)
-admin.site.register(Payment)
-admin.site.register(DocumentTemplate)
+from core.admin import LargeTableAdmin
+from .models import (Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate,
+                     RecurringInvoice, RecurringInvoiceLine, OutboundMessage)
+
+# Tasks are imported inside the actions so loading the admin never pulls Celery into web processes.
+
+@admin.register(Customer)
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ("name", "email", "phone", "tax_id", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization",)
+    search_fields = ("name", "email", "=tax_id")
+
+class QuoteLineInline(admin.TabularInline):
+    model = QuoteLine
+    extra = 0
+    autocomplete_fields = ("product", "tax")
+
+@admin.register(Quote)
+class QuoteAdmin(LargeTableAdmin):
+    list_display = ("number", "customer", "issue_date", "status", "organization")
+    list_select_related = ("customer", "organization")
+    list_filter = ("organization", "status", ("issue_date", admin.DateFieldListFilter))
+    search_fields = ("^number",)
+    autocomplete_fields = ("customer",)
+    inlines = [QuoteLineInline]
+
+@admin.register(QuoteLine)
+class QuoteLineAdmin(LargeTableAdmin):
+    list_display = ("quote", "description", "product", "quantity", "unit_price", "tax")
+    list_select_related = ("quote", "product", "tax")
+    raw_id_fields = ("quote",)
+    autocomplete_fields = ("product", "tax")
+
+class InvoiceLineInline(admin.TabularInline):
+    model = InvoiceLine
+    extra = 0
+    autocomplete_fields = ("product", "tax")
+
+class PaymentInline(admin.TabularInline):
+    model = Payment
+    extra = 0
+
+@admin.register(Invoice)
+class InvoiceAdmin(LargeTableAdmin):
+    list_display = ("number", "customer", "issue_date", "due_date", "status", "currency", "organization")
+    list_select_related = ("customer", "organization")
+    # (organization, status, issue_date) and (organization, issue_date) indexes back these filters
+    list_filter = ("organization", "status", ("issue_date", admin.DateFieldListFilter))
+    search_fields = ("^number",)
+    autocomplete_fields = ("customer", "quote")
+    raw_id_fields = ("recurring",)
+    ordering = ("-issue_date", "-id")
+    inlines = [InvoiceLineInline, PaymentInline]
+    actions = ["mark_paid", "regenerate_pdf"]
+
+    @admin.action(description="Marquer comme payées (arrière-plan)")
+    def mark_paid(self, request, queryset):
+        from .tasks import mark_invoices_paid
+        self.enqueue_in_chunks(request, mark_invoices_paid, queryset, "Marquage payé")
+
+    @admin.action(description="Régénérer les PDF (arrière-plan)")
+    def regenerate_pdf(self, request, queryset):
+        from .tasks import regenerate_invoice_pdfs
+        self.enqueue_in_chunks(request, regenerate_invoice_pdfs, queryset, "Régénération PDF", chunk_size=100)
+
+@admin.register(InvoiceLine)
+class InvoiceLineAdmin(LargeTableAdmin):
+    list_display = ("invoice", "description", "product", "quantity", "unit_price", "tax")
+    list_select_related = ("invoice", "product", "tax")
+    list_filter = ("invoice__organization",)
+    raw_id_fields = ("invoice",)
+    autocomplete_fields = ("product", "tax")
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ("invoice", "amount", "method", "paid_at")
+    list_select_related = ("invoice",)
+    list_filter = ("invoice__organization", "method", ("paid_at", admin.DateFieldListFilter))
+    raw_id_fields = ("invoice",)
+    ordering = ("-paid_at",)
+
+@admin.register(DocumentTemplate)
+class DocumentTemplateAdmin(admin.ModelAdmin):
+    list_display = ("name", "kind", "locale", "is_default", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization", "kind")
+
+class RecurringInvoiceLineInline(admin.TabularInline):
+    model = RecurringInvoiceLine
+    extra = 0
+    autocomplete_fields = ("product", "tax")
+
+@admin.register(RecurringInvoice)
+class RecurringInvoiceAdmin(LargeTableAdmin):
+    list_display = ("__str__", "customer", "cadence", "interval", "next_run_date", "end_date", "is_active", "organization")
+    list_select_related = ("customer", "organization")
+    list_filter = ("organization", "is_active", "cadence")
+    search_fields = ("name", "customer__name")
+    autocomplete_fields = ("customer",)
+    readonly_fields = ("occurrences",)
+    inlines = [RecurringInvoiceLineInline]
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(LargeTableAdmin):
+    list_display = ("id", "to_number", "status", "attempts", "next_attempt_at", "sent_at", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization", "status")
+    search_fields = ("=to_number", "=provider_message_id")
+    raw_id_fields = ("invoice",)
+    ordering = ("-id",)
@@ -1,14 +1,152 @@
+import threading
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+DEFAULT_API_BASE_URL = "https://graph.facebook.com/v19.0"
 
 def click_to_chat_link(phone_number: str, text: str) -> str:
     # Returns a wa.me link; phone should be in international format without '+'
     enc = urllib.parse.quote(text)
     return f"https://wa.me/{phone_number}?text={enc}"
 
-# Placeholder for WhatsApp Business Cloud API (sending messages requires Meta App and tokens).
-def send_order_via_whatsapp_cloud_api(phone_number_id: str, access_token: str, to_number: str, text: str):
-    # Implement with requests.post to https://graph.facebook.com/v19.0/{phone_number_id}/messages
-    # headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    # data = {"messaging_product": "whatsapp", "to": to_number, "type": "text", "text": {"body": text}}
-    # requests.post(url, json=data, headers=headers)
-    pass
+def text_payload(to_number: str, text: str) -> dict:
+    return {"messaging_product": "whatsapp", "to": to_number, "type": "text", "text": {"body": text}}
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/second, up to `capacity` in reserve."""
+    def __init__(self, rate: float, capacity: float | None = None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, n: float = 1) -> float:
+        # Returns 0 when the tokens were taken, otherwise the seconds to wait before retrying.
+        with self._lock:
+            self._refill()
+            if self.tokens >= n:
+                self.tokens -= n
+                return 0.0
+            return (n - self.tokens) / self.rate
+
+    def acquire(self, n: float = 1, sleep=time.sleep):
+        while True:
+            wait = self.try_acquire(n)
+            if not wait:
+                return
+            sleep(wait)
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(phone_number_id: str, rate: float, capacity: float | None = None) -> TokenBucket:
+    # One bucket per sending number, shared by every thread of the worker process; the sender lock in
+    # billing/outbox.py keeps other processes from sending for the same number meanwhile.
+    with _buckets_lock:
+        bucket = _buckets.get(phone_number_id)
+        if bucket is None or bucket.rate != rate:
+            bucket = _buckets[phone_number_id] = TokenBucket(rate, capacity)
+        return bucket
+
+@dataclass
+class SendResult:
+    ok: bool
+    status_code: int = 0
+    message_id: str = ""
+    error: str = ""
+    retryable: bool = False
+    retry_after: float | None = None
+
+def _retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CloudAPIClient:
+    """WhatsApp Business Cloud API client over a pooled keep-alive session."""
+    def __init__(self, base_url: str = DEFAULT_API_BASE_URL, timeout: float = 10.0, pool_size: int = 10, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        if session is None:
+            # requests is imported here so web processes that only queue messages never load it.
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+
+    def send(self, phone_number_id: str, access_token: str, payload: dict) -> SendResult:
+        from requests import RequestException
+        url = f"{self.base_url}/{phone_number_id}/messages"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        try:
+            resp = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        except RequestException as exc:
+            return SendResult(ok=False, error=str(exc), retryable=True)
+        if resp.status_code < 300:
+            try:
+                message_id = resp.json()["messages"][0]["id"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                message_id = ""
+            return SendResult(ok=True, status_code=resp.status_code, message_id=message_id)
+        retryable = resp.status_code == 429 or resp.status_code >= 500
+        return SendResult(
+            ok=False,
+            status_code=resp.status_code,
+            error=resp.text[:500],
+            retryable=retryable,
+            retry_after=_retry_after(resp.headers.get("Retry-After")) if retryable else None,
+        )
+
+    def close(self):
+        self.session.close()
+
+_client: CloudAPIClient | None = None
+_client_lock = threading.Lock()
+
+def get_client() -> CloudAPIClient:
+    # Lazily built per process so prefork Celery children never share sockets with the parent.
+    global _client
+    with _client_lock:
+        if _client is None:
+            from django.conf import settings
+            _client = CloudAPIClient(
+                base_url=getattr(settings, "WHATSAPP_API_BASE_URL", DEFAULT_API_BASE_URL),
+                timeout=getattr(settings, "WHATSAPP_HTTP_TIMEOUT", 10.0),
+                pool_size=getattr(settings, "WHATSAPP_HTTP_POOL_SIZE", 10),
+            )
+        return _client
+
+def send_order_via_whatsapp_cloud_api(phone_number_id: str, access_token: str, to_number: str, text: str) -> SendResult:
+    # Direct, unqueued send; prefer billing.outbox.enqueue_whatsapp_message for anything customer-facing.
+    return get_client().send(phone_number_id, access_token, text_payload(to_number, text))
+
+def send_many(client: CloudAPIClient, jobs: list, bucket: TokenBucket | None = None, concurrency: int = 1) -> list[SendResult]:
+    """Sends (phone_number_id, access_token, payload) jobs, honouring the bucket; results keep job order."""
+    def _send(job):
+        if bucket is not None:
+            bucket.acquire()
+        return client.send(*job)
+    if concurrency <= 1 or len(jobs) <= 1:
+        return [_send(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(_send, jobs))
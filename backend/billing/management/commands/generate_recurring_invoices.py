@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Organization
+from core.utils import parse_day
+from billing.recurring import generate_due_invoices, generate_for_org
+
+class Command(BaseCommand):
+    help = "Génère les factures récurrentes échues (sans doublon si relancé)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="YYYY-MM-DD (aujourd'hui par défaut)")
+        parser.add_argument("--org", help="org_code (toutes les organisations par défaut)")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Échéanciers par transaction")
+
+    def handle(self, *args, **opts):
+        today = parse_day(opts["date"]) if opts["date"] else timezone.localdate()
+        if today is None:
+            raise CommandError("Date invalide, format attendu YYYY-MM-DD.")
+        start = time.perf_counter()
+        if opts["org"]:
+            org = Organization.objects.filter(org_code=opts["org"]).first()
+            if org is None:
+                raise CommandError(f"Organisation inconnue : {opts['org']}")
+            counts = {org.org_code: generate_for_org(org, today, opts["chunk_size"])}
+        else:
+            counts = generate_due_invoices(today, opts["chunk_size"])
+        elapsed = time.perf_counter() - start
+        for org_code, n in counts.items():
+            self.stdout.write(f"{org_code}: {n} facture(s)")
+        total = sum(counts.values())
+        self.stdout.write(f"Total : {total} facture(s) en {elapsed:.1f}s")
@@ -0,0 +1,85 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from billing.integrations.whatsapp import CloudAPIClient, TokenBucket, send_many, text_payload
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like graph.facebook.com
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            status, body = 429, {"error": {"message": "rate limited", "code": 130429}}
+        else:
+            with self.server.lock:
+                self.server.accepted += 1
+                n = self.server.accepted
+            status, body = 200, {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.STUB{n}"}]}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class Command(BaseCommand):
+    help = "Envoie des messages WhatsApp vers un serveur HTTP local simulé et mesure le débit (messages/s)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--rate", type=float, default=0, help="Limite du token bucket (msg/s), 0 = illimité")
+        parser.add_argument("--latency-ms", type=float, default=0, help="Latence simulée par requête")
+        parser.add_argument("--error-rate", type=float, default=0, help="Proportion de réponses 429")
+        parser.add_argument("--base-url", default="", help="Serveur existant au lieu du stub local")
+
+    def handle(self, *args, **opts):
+        server = None
+        base_url = opts["base_url"]
+        if not base_url:
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+            server.daemon_threads = True
+            server.lock = threading.Lock()
+            server.connections = server.accepted = 0
+            server.latency = opts["latency_ms"] / 1000.0
+            server.error_rate = opts["error_rate"]
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}/v19.0"
+
+        client = CloudAPIClient(base_url=base_url, pool_size=max(opts["concurrency"], 1))
+        bucket = TokenBucket(opts["rate"]) if opts["rate"] else None
+        pending = [("BENCH", "token", text_payload(f"22990{i:06d}", f"Facture FAC-BENCH-{i:06d}")) for i in range(opts["messages"])]
+        sent = retries = 0
+        start = time.perf_counter()
+        # Retryable failures are re-sent immediately; the real queue delays them with backoff_delay().
+        while pending:
+            results = send_many(client, pending, bucket=bucket, concurrency=opts["concurrency"])
+            sent += sum(1 for r in results if r.ok)
+            failed = [job for job, r in zip(pending, results) if not r.ok and r.retryable]
+            retries += len(failed)
+            pending = failed
+        elapsed = time.perf_counter() - start
+        client.close()
+
+        self.stdout.write(f"messages envoyés : {sent} en {elapsed:.2f}s -> {sent / elapsed if elapsed else 0:.0f} msg/s")
+        self.stdout.write(f"réessais (429/5xx) : {retries}")
+        if server is not None:
+            self.stdout.write(f"connexions TCP ouvertes : {server.connections}")
+            server.shutdown()
+            server.server_close()
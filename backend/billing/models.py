@@ -1,4 +1,6 @@
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 from core.models import OrgScopedModel
 from products.models import Product, Tax
 
@@ -21,6 +23,8 @@ class Quote(OrgScopedModel):
     status = models.CharField(max_length=20, default="DRAFT")  # DRAFT, SENT, ACCEPTED, REJECTED, EXPIRED
     class Meta:
         unique_together = ("organization","number")
+    def __str__(self):
+        return self.number
 
 class QuoteLine(models.Model):
     quote = models.ForeignKey(Quote, related_name="lines", on_delete=models.CASCADE)
@@ -30,6 +34,36 @@ class QuoteLine(models.Model):
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     tax = models.ForeignKey(Tax, null=True, blank=True, on_delete=models.SET_NULL)
 
+class RecurringInvoice(OrgScopedModel):
+    CADENCE_CHOICES = [("WEEKLY","WEEKLY"),("MONTHLY","MONTHLY"),("QUARTERLY","QUARTERLY"),("YEARLY","YEARLY")]
+    name = models.CharField(max_length=200, blank=True)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
+    currency = models.CharField(max_length=3, default="XOF")
+    cadence = models.CharField(max_length=20, choices=CADENCE_CHOICES, default="MONTHLY")
+    interval = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])  # every N cadence units
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)  # last possible issue date
+    due_days = models.PositiveSmallIntegerField(default=30)
+    occurrences = models.PositiveIntegerField(default=0)  # invoices generated so far
+    next_run_date = models.DateField()
+    is_active = models.BooleanField(default=True)
+    class Meta:
+        indexes = [models.Index(fields=["is_active","next_run_date","organization"])]
+        constraints = [
+            # interval 0 would never advance next_run_date and spin the generator forever
+            models.CheckConstraint(condition=models.Q(interval__gte=1), name="recurring_interval_min_1"),
+        ]
+    def __str__(self):
+        return self.name or f"{self.customer} ({self.cadence})"
+
+class RecurringInvoiceLine(models.Model):
+    recurring = models.ForeignKey(RecurringInvoice, related_name="lines", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL)
+    description = models.CharField(max_length=255)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    tax = models.ForeignKey(Tax, null=True, blank=True, on_delete=models.SET_NULL)
+
 class Invoice(OrgScopedModel):
     number = models.CharField(max_length=30)
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
@@ -37,9 +71,28 @@ class Invoice(OrgScopedModel):
     due_date = models.DateField(null=True, blank=True)
     currency = models.CharField(max_length=3, default="XOF")
     quote = models.ForeignKey(Quote, null=True, blank=True, on_delete=models.SET_NULL)
+    recurring = models.ForeignKey(RecurringInvoice, null=True, blank=True, on_delete=models.SET_NULL, related_name="invoices")
     status = models.CharField(max_length=20, default="DRAFT")  # DRAFT, SENT, PARTIALLY_PAID, PAID, CANCELLED
     class Meta:
         unique_together = ("organization","number")
+        constraints = [
+            # one invoice per schedule and period, so re-running the generator is harmless
+            models.UniqueConstraint(fields=["recurring","issue_date"], condition=models.Q(recurring__isnull=False), name="uniq_recurring_period"),
+        ]
+        indexes = [
+            models.Index(fields=["organization","issue_date"]),
+            models.Index(fields=["organization","status","issue_date"]),
+        ]
+    def __str__(self):
+        return self.number
+
+class DocumentSequence(OrgScopedModel):
+    # Block-allocated document numbers, see billing/numbering.py
+    kind = models.CharField(max_length=20)  # INVOICE
+    year = models.PositiveSmallIntegerField()
+    last_value = models.PositiveIntegerField(default=0)
+    class Meta:
+        unique_together = ("organization","kind","year")
 
 class InvoiceLine(models.Model):
     invoice = models.ForeignKey(Invoice, related_name="lines", on_delete=models.CASCADE)
@@ -54,6 +107,8 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     method = models.CharField(max_length=30, default="CASH")  # CASH, CARD, TRANSFER, MOBILE
     paid_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [models.Index(fields=["paid_at"])]
 
 class DocumentTemplate(OrgScopedModel):
     KIND_CHOICES = [("INVOICE","INVOICE"),("QUOTE","QUOTE"),("EMAIL","EMAIL")]
@@ -63,3 +118,27 @@ class DocumentTemplate(OrgScopedModel):
     html = models.TextField()
     css = models.TextField(blank=True)
     is_default = models.BooleanField(default=False)
+
+class OutboundMessage(OrgScopedModel):
+    QUEUED, SENDING, SENT, DELIVERED, READ, FAILED = "QUEUED","SENDING","SENT","DELIVERED","READ","FAILED"
+    STATUS_CHOICES = [(QUEUED,"QUEUED"),(SENDING,"SENDING"),(SENT,"SENT"),(DELIVERED,"DELIVERED"),(READ,"READ"),(FAILED,"FAILED")]
+    CHANNEL_CHOICES = [("WHATSAPP","WHATSAPP")]
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default="WHATSAPP")
+    phone_number_id = models.CharField(max_length=64)  # sender, rate-limited independently
+    to_number = models.CharField(max_length=32)
+    payload = models.JSONField()
+    invoice = models.ForeignKey(Invoice, null=True, blank=True, on_delete=models.SET_NULL, related_name="messages")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    provider_message_id = models.CharField(max_length=128, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=["status","phone_number_id","next_attempt_at"]),
+            models.Index(fields=["provider_message_id"]),
+        ]
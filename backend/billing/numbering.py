@@ -0,0 +1,36 @@
+import re
+from django.db import transaction
+from compliance.uemoa import UEMOAAdapter
+from .models import DocumentSequence, Invoice
+
+SEQ_RE = re.compile(r"\{SEQ:(\d+)\}")
+
+def format_number(fmt: str, country: str, year: int, seq: int) -> str:
+    out = fmt.replace("{COUNTRY}", country).replace("{YYYY}", str(year))
+    return SEQ_RE.sub(lambda m: str(seq).zfill(int(m.group(1))), out)
+
+def number_prefix(fmt: str, country: str, year: int) -> str:
+    return format_number(fmt.split("{SEQ", 1)[0], country, year, 0)
+
+def _highest_issued(org, prefix):
+    # Highest number already used with this prefix, e.g. typed by hand (zero-padded, so max() sorts right).
+    last = (Invoice.objects.filter(organization=org, number__startswith=prefix)
+            .order_by("-number").values_list("number", flat=True).first())
+    digits = re.match(r"\d+", last[len(prefix):]) if last else None
+    return int(digits.group()) if digits else 0
+
+def allocate_invoice_numbers(org, year: int, count: int) -> list[str]:
+    """Reserves `count` consecutive invoice numbers with a single locked row update."""
+    if count <= 0:
+        return []
+    fmt = UEMOAAdapter().rules().numbering_format
+    prefix = number_prefix(fmt, org.country_code, year)
+    with transaction.atomic():
+        seq, _ = DocumentSequence.objects.get_or_create(organization=org, kind="INVOICE", year=year)
+        seq = DocumentSequence.objects.select_for_update().get(pk=seq.pk)
+        # Re-checked under the row lock on every allocation: invoices numbered by hand in the same series since
+        # the last block must not be handed out again.
+        start = max(seq.last_value, _highest_issued(org, prefix)) + 1
+        seq.last_value = start + count - 1
+        seq.save(update_fields=["last_value"])
+    return [format_number(fmt, org.country_code, year, n) for n in range(start, start + count)]
@@ -0,0 +1,166 @@
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .integrations.whatsapp import bucket_for, get_client, send_many, text_payload
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+# Provider statuses only ever move forward; a late "sent" webhook must not undo "read".
+STATUS_RANK = {
+    OutboundMessage.QUEUED: 0,
+    OutboundMessage.SENDING: 1,
+    OutboundMessage.SENT: 2,
+    OutboundMessage.DELIVERED: 3,
+    OutboundMessage.READ: 4,
+    OutboundMessage.FAILED: 5,
+}
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def enqueue_whatsapp_messages(org, messages, invoice=None):
+    """Queues (to_number, text) pairs for `org`; returns the created OutboundMessage rows."""
+    if not org.whatsapp_phone_number_id:
+        raise ValueError("WhatsApp Cloud API non configuré pour cette organisation.")
+    now = timezone.now()
+    rows = OutboundMessage.objects.bulk_create([
+        OutboundMessage(
+            organization=org,
+            phone_number_id=org.whatsapp_phone_number_id,
+            to_number=to_number,
+            payload=text_payload(to_number, text),
+            invoice=invoice,
+            next_attempt_at=now,
+        )
+        for to_number, text in messages
+    ], batch_size=500)
+    phone_number_id = org.whatsapp_phone_number_id
+    transaction.on_commit(lambda: _kick(phone_number_id))
+    return rows
+
+def enqueue_whatsapp_message(org, to_number, text, invoice=None):
+    return enqueue_whatsapp_messages(org, [(to_number, text)], invoice=invoice)[0]
+
+def _flush_key(phone_number_id):
+    return f"whatsapp:flush:{phone_number_id}"
+
+def _kick_key(phone_number_id):
+    return f"whatsapp:kick:{phone_number_id}"
+
+def acquire_sender(phone_number_id):
+    """Claims the right to send for one phone number id across all workers; returns a token or None.
+
+    Only the holder sends, so its in-process TokenBucket is the sender's real rate.
+    """
+    token = uuid.uuid4().hex
+    ttl = _setting("WHATSAPP_FLUSH_SECONDS", 50) + _setting("WHATSAPP_HTTP_TIMEOUT", 10) * 2 + 30
+    return token if cache.add(_flush_key(phone_number_id), token, timeout=ttl) else None
+
+def release_sender(phone_number_id, token):
+    # Don't drop a lock that expired and was taken over by another flush.
+    if cache.get(_flush_key(phone_number_id)) == token:
+        cache.delete(_flush_key(phone_number_id))
+
+def _kick(phone_number_id):
+    # At most one pending kick per sender and none while a flush is draining it; rows that land after a flush's
+    # last empty batch are picked up by the beat dispatcher. A broker or cache outage only delays delivery.
+    from .tasks import flush_whatsapp_outbox
+    try:
+        if cache.get(_flush_key(phone_number_id)) or not cache.add(_kick_key(phone_number_id), 1, timeout=5):
+            return
+        flush_whatsapp_outbox.delay(phone_number_id)
+    except Exception:
+        logger.warning("Relance de l'envoi WhatsApp impossible pour %s ; reprise par le planificateur.", phone_number_id,
+                       exc_info=True)
+
+def backoff_delay(attempts, retry_after=None):
+    base = _setting("WHATSAPP_RETRY_BASE_SECONDS", 2)
+    cap = _setting("WHATSAPP_RETRY_MAX_SECONDS", 900)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    delay = delay / 2 + random.uniform(0, delay / 2)  # jitter so retries don't arrive in lockstep
+    return max(delay, retry_after or 0)
+
+def claim_batch(phone_number_id, limit):
+    """Atomically moves up to `limit` due messages of one sender to SENDING and returns them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(OutboundMessage.objects
+                   .select_for_update(skip_locked=True)
+                   .filter(status=OutboundMessage.QUEUED, phone_number_id=phone_number_id, next_attempt_at__lte=now)
+                   .order_by("next_attempt_at", "id")
+                   .values_list("id", flat=True)[:limit])
+        OutboundMessage.objects.filter(id__in=ids).update(status=OutboundMessage.SENDING, updated_at=now)
+    return list(OutboundMessage.objects.filter(id__in=ids).select_related("organization").order_by("id"))
+
+def process_batch(phone_number_id, limit=None):
+    """Sends one batch for a sender and records the outcome; returns the number of messages handled."""
+    batch = claim_batch(phone_number_id, limit or _setting("WHATSAPP_BATCH_SIZE", 50))
+    if not batch:
+        return 0
+    bucket = bucket_for(phone_number_id, _setting("WHATSAPP_RATE_PER_SECOND", 20), _setting("WHATSAPP_BURST", None))
+    jobs = [(m.phone_number_id, m.organization.whatsapp_access_token, m.payload) for m in batch]
+    results = send_many(get_client(), jobs, bucket=bucket, concurrency=_setting("WHATSAPP_SEND_CONCURRENCY", 4))
+    now = timezone.now()
+    max_attempts = _setting("WHATSAPP_MAX_ATTEMPTS", 8)
+    for msg, res in zip(batch, results):
+        msg.attempts += 1
+        msg.updated_at = now
+        if res.ok:
+            msg.status = OutboundMessage.SENT
+            msg.provider_message_id = res.message_id
+            msg.sent_at = now
+            msg.last_error = ""
+        elif res.retryable and msg.attempts < max_attempts:
+            msg.status = OutboundMessage.QUEUED
+            msg.next_attempt_at = now + timedelta(seconds=backoff_delay(msg.attempts, res.retry_after))
+            msg.last_error = f"{res.status_code} {res.error}".strip()
+        else:
+            msg.status = OutboundMessage.FAILED
+            msg.last_error = f"{res.status_code} {res.error}".strip()
+    OutboundMessage.objects.bulk_update(
+        batch, ["status", "attempts", "next_attempt_at", "provider_message_id", "sent_at", "last_error", "updated_at"]
+    )
+    return len(batch)
+
+def requeue_stale(older_than=timedelta(minutes=10)):
+    # Rows left in SENDING by a killed worker; the provider may have accepted them (at-least-once).
+    cutoff = timezone.now() - older_than
+    return OutboundMessage.objects.filter(status=OutboundMessage.SENDING, updated_at__lt=cutoff).update(
+        status=OutboundMessage.QUEUED, next_attempt_at=timezone.now()
+    )
+
+def due_senders():
+    return list(OutboundMessage.objects
+                .filter(status=OutboundMessage.QUEUED, next_attempt_at__lte=timezone.now())
+                .order_by().values_list("phone_number_id", flat=True).distinct())
+
+def apply_status_updates(statuses):
+    """Applies Cloud API webhook `statuses` entries; returns the number of rows updated."""
+    updated = 0
+    for st in statuses:
+        new_status = str(st.get("status", "")).upper()
+        if new_status not in STATUS_RANK or not st.get("id"):
+            continue
+        msg = OutboundMessage.objects.filter(provider_message_id=st["id"]).first()
+        if msg is None or STATUS_RANK[new_status] <= STATUS_RANK[msg.status]:
+            continue
+        msg.status = new_status
+        fields = ["status", "updated_at"]
+        if new_status in (OutboundMessage.DELIVERED, OutboundMessage.READ) and not msg.delivered_at:
+            ts = st.get("timestamp")
+            msg.delivered_at = datetime.fromtimestamp(int(ts), tz=dt_timezone.utc) if ts else timezone.now()
+            fields.append("delivered_at")
+        if new_status == OutboundMessage.FAILED:
+            msg.last_error = "; ".join(e.get("title", "") for e in st.get("errors", []))[:500]
+            fields.append("last_error")
+        msg.save(update_fields=fields)
+        updated += 1
+    return updated
@@ -0,0 +1,138 @@
+"""Recurring invoice generation and quote conversion, both built on bulk line copies."""
+import calendar
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from core.models import Organization
+from .models import Invoice, InvoiceLine, Quote, RecurringInvoice
+from .numbering import allocate_invoice_numbers
+
+LINE_FIELDS = ("product_id", "description", "quantity", "unit_price", "tax_id")
+CADENCE_MONTHS = {"MONTHLY": 1, "QUARTERLY": 3, "YEARLY": 12}
+
+logger = logging.getLogger(__name__)
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+def occurrence_date(schedule, n):
+    # Always derived from start_date so a 31st keeps landing on month ends after February.
+    if schedule.cadence == "WEEKLY":
+        return schedule.start_date + timedelta(weeks=schedule.interval * n)
+    return add_months(schedule.start_date, CADENCE_MONTHS[schedule.cadence] * schedule.interval * n)
+
+def reschedule(schedule, billed_until):
+    """Re-derives occurrences and next_run_date after start_date, cadence or interval changed.
+
+    Every period before `billed_until` (the next run date under the old settings) has been invoiced already,
+    so the schedule resumes at its first new occurrence on or after that date.
+    """
+    n = 0
+    if schedule.occurrences:
+        while occurrence_date(schedule, n) < billed_until:
+            n += 1
+    schedule.occurrences = n
+    schedule.next_run_date = occurrence_date(schedule, n)
+    if schedule.end_date is not None and schedule.next_run_date > schedule.end_date:
+        schedule.is_active = False
+
+def copy_lines(pairs, batch_size=1000):
+    """Bulk-copies template lines onto invoices; `pairs` is [(invoice, source_lines)]."""
+    lines = [
+        InvoiceLine(invoice=invoice, **{f: getattr(src, f) for f in LINE_FIELDS})
+        for invoice, sources in pairs
+        for src in sources
+    ]
+    InvoiceLine.objects.bulk_create(lines, batch_size=batch_size)
+    return len(lines)
+
+def create_invoices(org, drafts):
+    """Creates invoices with block-allocated numbers and copied lines.
+
+    `drafts` is [(Invoice without number, source_lines)]; must run inside a transaction.
+    """
+    by_year = defaultdict(list)
+    for invoice, _ in drafts:
+        by_year[invoice.issue_date.year].append(invoice)
+    for year, invoices in by_year.items():
+        for invoice, number in zip(invoices, allocate_invoice_numbers(org, year, len(invoices))):
+            invoice.number = number
+    Invoice.objects.bulk_create([invoice for invoice, _ in drafts], batch_size=1000)
+    copy_lines(drafts)
+    return [invoice for invoice, _ in drafts]
+
+def convert_quote(quote, issue_date=None, due_days=30):
+    """Turns a quote into an invoice (or returns the one already created from it)."""
+    issue_date = issue_date or timezone.localdate()
+    with transaction.atomic():
+        # The quote row lock serializes concurrent conversions, so the second one sees the first invoice.
+        quote = Quote.objects.select_for_update().get(pk=quote.pk)
+        existing = Invoice.objects.filter(quote=quote).first()
+        if existing:
+            return existing
+        invoice = Invoice(organization=quote.organization, customer=quote.customer, currency=quote.currency,
+                          issue_date=issue_date, due_date=issue_date + timedelta(days=due_days), quote=quote)
+        create_invoices(quote.organization, [(invoice, list(quote.lines.all()))])
+        quote.status = "ACCEPTED"
+        quote.save(update_fields=["status"])
+    return invoice
+
+def _materialize(org, schedules, today):
+    drafts, seen = [], set()
+    existing = set(Invoice.objects.filter(recurring__in=schedules).filter(
+        issue_date__lte=today, issue_date__gte=min(s.next_run_date for s in schedules)
+    ).values_list("recurring_id", "issue_date"))
+    for schedule in schedules:
+        lines = list(schedule.lines.all())
+        while schedule.next_run_date <= today and (schedule.end_date is None or schedule.next_run_date <= schedule.end_date):
+            key = (schedule.id, schedule.next_run_date)
+            if key not in existing and key not in seen:
+                seen.add(key)
+                drafts.append((Invoice(
+                    organization=org, customer_id=schedule.customer_id, currency=schedule.currency,
+                    issue_date=schedule.next_run_date, due_date=schedule.next_run_date + timedelta(days=schedule.due_days),
+                    recurring=schedule,
+                ), lines))
+            schedule.occurrences += 1
+            schedule.next_run_date = occurrence_date(schedule, schedule.occurrences)
+        if schedule.end_date is not None and schedule.next_run_date > schedule.end_date:
+            schedule.is_active = False
+    return drafts
+
+def generate_for_org(org, today=None, chunk_size=200):
+    """Materializes every due invoice of one organization, one bounded transaction per chunk."""
+    today = today or timezone.localdate()
+    created = 0
+    while True:
+        with transaction.atomic():
+            schedules = list(RecurringInvoice.objects
+                             .select_for_update(skip_locked=True)
+                             .filter(organization=org, is_active=True, next_run_date__lte=today)
+                             .order_by("id")[:chunk_size])
+            if not schedules:
+                return created
+            prefetch_related_objects(schedules, "lines")
+            drafts = _materialize(org, schedules, today)
+            create_invoices(org, drafts)
+            RecurringInvoice.objects.bulk_update(schedules, ["occurrences", "next_run_date", "is_active"])
+            created += len(drafts)
+
+def generate_due_invoices(today=None, chunk_size=200):
+    today = today or timezone.localdate()
+    org_ids = (RecurringInvoice.objects.filter(is_active=True, next_run_date__lte=today)
+               .order_by().values_list("organization_id", flat=True).distinct())
+    created = {}
+    for org in Organization.objects.filter(id__in=list(org_ids)).order_by("id"):
+        # One organization's bad data must not hold up everyone else's invoices; it is retried next run.
+        try:
+            created[org.org_code] = generate_for_org(org, today, chunk_size)
+        except Exception:
+            logger.exception("Échec de la génération des factures récurrentes pour %s", org.org_code)
+    return created
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate
+from .models import Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate, OutboundMessage, RecurringInvoice, RecurringInvoiceLine
+from .recurring import reschedule
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,3 +39,50 @@ class DocumentTemplateSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentTemplate
         fields = "__all__"
+
+class OutboundMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboundMessage
+        fields = "__all__"
+
+class RecurringInvoiceLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecurringInvoiceLine
+        exclude = ["recurring"]
+
+class RecurringInvoiceSerializer(serializers.ModelSerializer):
+    lines = RecurringInvoiceLineSerializer(many=True)
+    SCHEDULE_FIELDS = ("start_date", "cadence", "interval")
+    class Meta:
+        model = RecurringInvoice
+        fields = "__all__"
+        read_only_fields = ["organization","occurrences","next_run_date"]
+    def validate(self, attrs):
+        # Partial updates are checked against the stored schedule.
+        start = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end = attrs["end_date"] if "end_date" in attrs else getattr(self.instance, "end_date", None)
+        if start and end and end < start:
+            raise serializers.ValidationError("La date de fin précède la date de début.")
+        return attrs
+    def create(self, validated_data):
+        lines = validated_data.pop("lines", [])
+        validated_data["next_run_date"] = validated_data["start_date"]
+        recurring = RecurringInvoice.objects.create(**validated_data)
+        RecurringInvoiceLine.objects.bulk_create([RecurringInvoiceLine(recurring=recurring, **line) for line in lines])
+        return recurring
+    def update(self, instance, validated_data):
+        lines = validated_data.pop("lines", None)
+        changed = any(f in validated_data and validated_data[f] != getattr(instance, f) for f in self.SCHEDULE_FIELDS)
+        with transaction.atomic():
+            # Lock against the generator and read the progress it may have made since the instance was loaded.
+            instance.occurrences, instance.next_run_date = (RecurringInvoice.objects.select_for_update()
+                                                            .values_list("occurrences", "next_run_date").get(pk=instance.pk))
+            billed_until = instance.next_run_date
+            instance = super().update(instance, validated_data)
+            if changed:
+                reschedule(instance, billed_until)
+                instance.save(update_fields=["occurrences", "next_run_date", "is_active"])
+            if lines is not None:
+                instance.lines.all().delete()
+                RecurringInvoiceLine.objects.bulk_create([RecurringInvoiceLine(recurring=instance, **line) for line in lines])
+        return instance
@@ -1,8 +1,47 @@
 from django.template import Template, Context
-from weasyprint import HTML, CSS
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.mail import EmailMessage
 
+def invoice_pdf_context(invoice, tmpl) -> dict:
+    org = invoice.organization
+    # very simplified compute
+    lines = []
+    subtotal = 0
+    for l in invoice.lines.all():
+        line_total = float(l.unit_price) * float(l.quantity)
+        subtotal += line_total
+        lines.append({"description": l.description, "quantity": float(l.quantity), "unit_price": float(l.unit_price), "tax": l.tax})
+    tax_rate = float(org.default_tax_rate) if org.tax_enabled else 0.0
+    tax_total = round(subtotal * tax_rate/100.0, 2)
+    grand_total = round(subtotal + tax_total, 2)
+    ctx = {
+        "template_html": tmpl.html,
+        "template_css": tmpl.css,
+        "org": org,
+        "invoice": invoice,
+        "customer": invoice.customer,
+        "lines": [{"description": l.description, "quantity": l.quantity, "unit_price": l.unit_price, "tax": l.tax} for l in invoice.lines.all()],
+        "subtotal": subtotal,
+        "tax_total": tax_total,
+        "grand_total": grand_total,
+        "vat_label": "TVA",
+    }
+    return ctx
+
+def invoice_pdf_path(invoice) -> str:
+    return f"invoices/{invoice.organization.org_code}/{invoice.number}.pdf"
+
+def store_invoice_pdf(invoice, pdf_bytes: bytes) -> str:
+    # Overwrites the previous rendering; storage.save would otherwise pick a new name.
+    path = invoice_pdf_path(invoice)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(pdf_bytes))
+
 def render_invoice_pdf(ctx: dict) -> bytes:
+    # WeasyPrint (Pango/cairo) is only loaded by processes that actually render a PDF.
+    from weasyprint import HTML, CSS
     html = Template(ctx["template_html"]).render(Context(ctx))
     css = CSS(string=ctx.get("template_css",""))
     pdf_bytes = HTML(string=html).write_pdf(stylesheets=[css])
@@ -0,0 +1,48 @@
+import time
+from config.celery import app
+from django.conf import settings
+from django.db import transaction
+from . import outbox, recurring
+from .models import DocumentTemplate, Invoice
+
+@app.task(ignore_result=True)
+def dispatch_whatsapp_outbox():
+    # Beat entry point: one flush task per sender so each phone number id drains independently.
+    outbox.requeue_stale()
+    for phone_number_id in outbox.due_senders():
+        flush_whatsapp_outbox.delay(phone_number_id)
+
+@app.task(ignore_result=True)
+def flush_whatsapp_outbox(phone_number_id):
+    # Single flush per sender at a time; overlapping kicks and beat runs return straight away.
+    token = outbox.acquire_sender(phone_number_id)
+    if token is None:
+        return
+    try:
+        deadline = time.monotonic() + getattr(settings, "WHATSAPP_FLUSH_SECONDS", 50)
+        while time.monotonic() < deadline:
+            if not outbox.process_batch(phone_number_id):
+                break
+    finally:
+        outbox.release_sender(phone_number_id, token)
+
+@app.task(ignore_result=True)
+def generate_recurring_invoices():
+    # Idempotent: one invoice per (schedule, issue date), so hourly runs only pick up what is due.
+    recurring.generate_due_invoices()
+
+@app.task(ignore_result=True)
+def mark_invoices_paid(invoice_ids):
+    with transaction.atomic():
+        Invoice.objects.filter(id__in=invoice_ids).exclude(status__in=["PAID","CANCELLED"]).update(status="PAID")
+
+@app.task(ignore_result=True)
+def regenerate_invoice_pdfs(invoice_ids):
+    from .services import invoice_pdf_context, render_invoice_pdf, store_invoice_pdf
+    templates = {}
+    for invoice in Invoice.objects.filter(id__in=invoice_ids).select_related("organization","customer").prefetch_related("lines__tax"):
+        org_id = invoice.organization_id
+        if org_id not in templates:
+            templates[org_id] = DocumentTemplate.objects.filter(organization_id=org_id, kind="INVOICE", is_default=True).first()
+        if templates[org_id] is not None:
+            store_invoice_pdf(invoice, render_invoice_pdf(invoice_pdf_context(invoice, templates[org_id])))
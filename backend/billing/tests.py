@@ -0,0 +1,243 @@
+import hashlib
+import hmac
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Organization
+from . import outbox
+from .integrations.whatsapp import CloudAPIClient, TokenBucket, text_payload
+from .models import Customer, Invoice, OutboundMessage, Quote, RecurringInvoice, RecurringInvoiceLine
+from .numbering import allocate_invoice_numbers
+from .recurring import convert_quote, generate_due_invoices, generate_for_org
+from .serializers import RecurringInvoiceSerializer
+
+class InvoiceNumberingTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Boutique", org_code="boutique", country_code="BJ")
+        self.customer = Customer.objects.create(organization=self.org, name="Client")
+
+    def test_skips_numbers_typed_by_hand_after_the_sequence_exists(self):
+        self.assertEqual(allocate_invoice_numbers(self.org, 2026, 3),
+                         ["FAC-BJ-2026-000001", "FAC-BJ-2026-000002", "FAC-BJ-2026-000003"])
+        Invoice.objects.create(organization=self.org, customer=self.customer, number="FAC-BJ-2026-000004",
+                               issue_date=date(2026, 3, 1))
+        self.assertEqual(allocate_invoice_numbers(self.org, 2026, 2), ["FAC-BJ-2026-000005", "FAC-BJ-2026-000006"])
+
+    def test_recurring_generation_survives_a_hand_typed_number(self):
+        schedule = RecurringInvoice.objects.create(organization=self.org, customer=self.customer, cadence="MONTHLY",
+                                                   start_date=date(2026, 1, 1), next_run_date=date(2026, 1, 1))
+        RecurringInvoiceLine.objects.create(recurring=schedule, description="Abonnement", quantity=1, unit_price=1000)
+        self.assertEqual(generate_for_org(self.org, today=date(2026, 3, 1)), 3)
+        Invoice.objects.create(organization=self.org, customer=self.customer, number="FAC-BJ-2026-000004",
+                               issue_date=date(2026, 3, 15))
+        self.assertEqual(generate_for_org(self.org, today=date(2026, 4, 1)), 1)
+        self.assertTrue(Invoice.objects.filter(recurring=schedule, number="FAC-BJ-2026-000005").exists())
+
+class RecurringGenerationTests(TestCase):
+    def test_one_failing_org_does_not_stop_the_others(self):
+        schedules = []
+        for code in ("aaa", "bbb"):
+            org = Organization.objects.create(name=code, org_code=code)
+            customer = Customer.objects.create(organization=org, name="Client")
+            schedules.append(RecurringInvoice.objects.create(organization=org, customer=customer, start_date=date(2026, 1, 1),
+                                                             next_run_date=date(2026, 1, 1)))
+        # Corrupt the first org's schedule so its generation raises.
+        RecurringInvoice.objects.filter(pk=schedules[0].pk).update(cadence="BOGUS")
+        with self.assertLogs("billing.recurring", "ERROR"):
+            result = generate_due_invoices(today=date(2026, 1, 1))
+        self.assertNotIn("aaa", result)
+        self.assertEqual(result["bbb"], 1)
+        self.assertEqual(Invoice.objects.filter(recurring=schedules[1]).count(), 1)
+
+class RecurringInvoiceSerializerTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Boutique", org_code="boutique")
+        self.customer = Customer.objects.create(organization=self.org, name="Client")
+
+    def payload(self, **extra):
+        return {"customer": self.customer.pk, "cadence": "MONTHLY", "start_date": "2026-01-31",
+                "lines": [{"description": "Abonnement", "quantity": "1", "unit_price": "1000"}], **extra}
+
+    def test_rejects_zero_interval(self):
+        serializer = RecurringInvoiceSerializer(data=self.payload(interval=0))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("interval", serializer.errors)
+
+    def test_partial_end_date_is_checked_against_stored_start(self):
+        serializer = RecurringInvoiceSerializer(data=self.payload())
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.save(organization=self.org)
+        serializer = RecurringInvoiceSerializer(schedule, data={"end_date": "2025-12-31"}, partial=True)
+        self.assertFalse(serializer.is_valid())
+
+    def test_cadence_change_resumes_after_billed_periods(self):
+        serializer = RecurringInvoiceSerializer(data=self.payload())
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.save(organization=self.org)
+        generate_for_org(self.org, today=date(2026, 3, 1))  # Jan 31 and Feb 28 billed, next run Mar 31
+        serializer = RecurringInvoiceSerializer(schedule, data={"cadence": "WEEKLY", "start_date": "2026-03-02"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.save()
+        self.assertEqual((schedule.occurrences, schedule.next_run_date), (5, date(2026, 4, 6)))
+
+    def test_start_date_change_before_first_run_moves_next_run(self):
+        serializer = RecurringInvoiceSerializer(data=self.payload())
+        serializer.is_valid(raise_exception=True)
+        schedule = serializer.save(organization=self.org)
+        serializer = RecurringInvoiceSerializer(schedule, data={"start_date": "2026-02-15"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(serializer.save().next_run_date, date(2026, 2, 15))
+
+class ConvertQuoteTests(TestCase):
+    def test_second_conversion_returns_the_first_invoice(self):
+        org = Organization.objects.create(name="Boutique", org_code="boutique")
+        customer = Customer.objects.create(organization=org, name="Client")
+        quote = Quote.objects.create(organization=org, customer=customer, number="DEV-1", issue_date=date(2026, 1, 5))
+        first = convert_quote(quote)
+        stale = Quote.objects.get(pk=quote.pk)
+        self.assertEqual(convert_quote(stale).pk, first.pk)
+        self.assertEqual(Invoice.objects.filter(quote=quote).count(), 1)
+
+class StubResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code, self.body, self.headers = status_code, body or {}, headers or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+class StubSession:
+    """Stands in for requests.Session: replays canned responses and records what was posted."""
+    def __init__(self, *responses):
+        self.responses, self.posted = list(responses), []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.posted.append((url, json))
+        return self.responses.pop(0)
+
+class TokenBucketTests(TestCase):
+    def test_wait_times_follow_the_refill_rate(self):
+        now = [100.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        self.assertEqual((bucket.try_acquire(), bucket.try_acquire()), (0.0, 0.0))
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        now[0] += 0.25
+        self.assertAlmostEqual(bucket.try_acquire(), 0.25)
+        now[0] += 0.25
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+    def test_acquire_sleeps_until_a_token_is_available(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=4, capacity=1, clock=lambda: now[0])
+        bucket.acquire()
+        slept = []
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+        bucket.acquire(sleep=sleep)
+        self.assertEqual(slept, [0.25])
+
+@override_settings(WHATSAPP_RETRY_BASE_SECONDS=2, WHATSAPP_RETRY_MAX_SECONDS=60)
+class BackoffTests(TestCase):
+    def test_delay_is_capped(self):
+        for _ in range(20):
+            self.assertTrue(30 <= outbox.backoff_delay(12) <= 60)
+
+    def test_first_retry_is_jittered_around_the_base(self):
+        for _ in range(20):
+            self.assertTrue(1 <= outbox.backoff_delay(1) <= 2)
+
+    def test_retry_after_is_a_floor(self):
+        self.assertEqual(outbox.backoff_delay(1, retry_after=120), 120)
+
+@override_settings(WHATSAPP_MAX_ATTEMPTS=3, WHATSAPP_SEND_CONCURRENCY=1, WHATSAPP_RATE_PER_SECOND=1000)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Boutique", org_code="boutique", whatsapp_phone_number_id="PN1",
+                                               whatsapp_access_token="secret-token")
+
+    def queue(self, **fields):
+        return OutboundMessage.objects.create(organization=self.org, phone_number_id="PN1", to_number="22990000000",
+                                              payload=text_payload("22990000000", "Bonjour"), **fields)
+
+    def flush(self, *responses):
+        session = StubSession(*responses)
+        with mock.patch.object(outbox, "get_client", return_value=CloudAPIClient(base_url="http://stub", session=session)):
+            handled = outbox.process_batch("PN1")
+        return handled, session
+
+    def test_accepted_message_is_marked_sent(self):
+        msg = self.queue()
+        handled, session = self.flush(StubResponse(200, {"messages": [{"id": "wamid.1"}]}))
+        msg.refresh_from_db()
+        self.assertEqual(handled, 1)
+        self.assertEqual(session.posted[0][0], "http://stub/PN1/messages")
+        self.assertEqual((msg.status, msg.provider_message_id, msg.attempts), (OutboundMessage.SENT, "wamid.1", 1))
+        self.assertIsNotNone(msg.sent_at)
+
+    def test_throttled_message_is_requeued_after_retry_after(self):
+        msg = self.queue()
+        before = timezone.now()
+        self.flush(StubResponse(429, {"error": "rate"}, {"Retry-After": "90"}))
+        msg.refresh_from_db()
+        self.assertEqual((msg.status, msg.attempts), (OutboundMessage.QUEUED, 1))
+        self.assertGreaterEqual(msg.next_attempt_at, before + timedelta(seconds=90))
+        self.assertTrue(msg.last_error.startswith("429"))
+        self.assertEqual(self.flush()[0], 0)  # not due yet
+
+    def test_message_fails_once_attempts_are_exhausted(self):
+        msg = self.queue(attempts=2)
+        self.flush(StubResponse(503))
+        msg.refresh_from_db()
+        self.assertEqual((msg.status, msg.attempts), (OutboundMessage.FAILED, 3))
+
+    def test_client_error_fails_without_retry(self):
+        msg = self.queue()
+        self.flush(StubResponse(400, {"error": "bad number"}))
+        msg.refresh_from_db()
+        self.assertEqual((msg.status, msg.attempts), (OutboundMessage.FAILED, 1))
+
+    def test_status_updates_never_move_backwards(self):
+        msg = self.queue(status=OutboundMessage.SENT, provider_message_id="wamid.1")
+        self.assertEqual(outbox.apply_status_updates([{"id": "wamid.1", "status": "read", "timestamp": "1767225600"}]), 1)
+        self.assertEqual(outbox.apply_status_updates([{"id": "wamid.1", "status": "delivered"},
+                                                      {"id": "wamid.1", "status": "sent"}]), 0)
+        msg.refresh_from_db()
+        self.assertEqual(msg.status, OutboundMessage.READ)
+        self.assertEqual(msg.delivered_at, datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+
+class WhatsAppWebhookTests(TestCase):
+    url = "/api/webhooks/whatsapp"
+
+    def post(self, body, signature=None):
+        headers = {"HTTP_X_HUB_SIGNATURE_256": signature} if signature is not None else {}
+        return self.client.post(self.url, data=body, content_type="application/json", **headers)
+
+    def setUp(self):
+        org = Organization.objects.create(name="Boutique", org_code="boutique")
+        self.msg = OutboundMessage.objects.create(organization=org, phone_number_id="PN1", to_number="229",
+                                                  payload={}, status=OutboundMessage.SENT, provider_message_id="wamid.1")
+        self.body = json.dumps({"entry": [{"changes": [{"value": {"statuses": [{"id": "wamid.1", "status": "delivered"}]}}]}]})
+
+    @override_settings(WHATSAPP_APP_SECRET="")
+    def test_rejected_when_no_secret_is_configured(self):
+        self.assertEqual(self.post(self.body).status_code, 503)
+
+    @override_settings(WHATSAPP_APP_SECRET="app-secret")
+    def test_rejects_a_bad_signature(self):
+        self.assertEqual(self.post(self.body, "sha256=deadbeef").status_code, 403)
+        self.assertEqual(self.post(self.body).status_code, 403)
+        self.msg.refresh_from_db()
+        self.assertEqual(self.msg.status, OutboundMessage.SENT)
+
+    @override_settings(WHATSAPP_APP_SECRET="app-secret")
+    def test_applies_signed_statuses(self):
+        signature = "sha256=" + hmac.new(b"app-secret", self.body.encode(), hashlib.sha256).hexdigest()
+        response = self.post(self.body, signature)
+        self.assertEqual((response.status_code, response.json()), (200, {"updated": 1}))
+        self.msg.refresh_from_db()
+        self.assertEqual(self.msg.status, OutboundMessage.DELIVERED)
@@ -1,13 +1,19 @@
 from rest_framework import viewsets, permissions, status
+import hashlib
+import hmac
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from core.utils import request_org
 from core.models import Organization
-from .models import Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate
-from .serializers import CustomerSerializer, QuoteSerializer, QuoteLineSerializer, InvoiceSerializer, InvoiceLineSerializer, PaymentSerializer, DocumentTemplateSerializer
-from .services import render_invoice_pdf, send_invoice_email
+from .models import Customer, Quote, QuoteLine, Invoice, InvoiceLine, Payment, DocumentTemplate, OutboundMessage, RecurringInvoice
+from .serializers import CustomerSerializer, QuoteSerializer, QuoteLineSerializer, InvoiceSerializer, InvoiceLineSerializer, PaymentSerializer, DocumentTemplateSerializer, OutboundMessageSerializer, RecurringInvoiceSerializer
+from .services import invoice_pdf_context, render_invoice_pdf, send_invoice_email
 from .integrations.whatsapp import click_to_chat_link
+from .outbox import enqueue_whatsapp_message, apply_status_updates
+from .recurring import convert_quote
 
 class OrgScopedViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
@@ -32,11 +38,25 @@ class InvoiceViewSet(OrgScopedViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+class RecurringInvoiceViewSet(OrgScopedViewSet):
+    queryset = RecurringInvoice.objects.prefetch_related("lines")
+    serializer_class = RecurringInvoiceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ["is_active","customer"]
+
 class PaymentViewSet(viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+class OutboundMessageViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = OutboundMessage.objects.all().order_by("-id")
+    serializer_class = OutboundMessageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ["status","invoice"]
+    def get_queryset(self):
+        return super().get_queryset().filter(organization=request_org(self.request))
+
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
 def send_invoice_email_view(request, pk:int):
@@ -45,28 +65,7 @@ def send_invoice_email_view(request, pk:int):
     tmpl = DocumentTemplate.objects.filter(organization=org, kind="INVOICE", is_default=True).first()
     if not tmpl:
         return Response({"detail":"Aucun template INVOICE par défaut."}, status=400)
-    # very simplified compute
-    lines = []
-    subtotal = 0
-    for l in invoice.lines.all():
-        line_total = float(l.unit_price) * float(l.quantity)
-        subtotal += line_total
-        lines.append({"description": l.description, "quantity": float(l.quantity), "unit_price": float(l.unit_price), "tax": l.tax})
-    tax_rate = float(org.default_tax_rate) if org.tax_enabled else 0.0
-    tax_total = round(subtotal * tax_rate/100.0, 2)
-    grand_total = round(subtotal + tax_total, 2)
-    ctx = {
-        "template_html": tmpl.html,
-        "template_css": tmpl.css,
-        "org": org,
-        "invoice": invoice,
-        "customer": invoice.customer,
-        "lines": [{"description": l.description, "quantity": l.quantity, "unit_price": l.unit_price, "tax": l.tax} for l in invoice.lines.all()],
-        "subtotal": subtotal,
-        "tax_total": tax_total,
-        "grand_total": grand_total,
-        "vat_label": "TVA",
-    }
+    ctx = invoice_pdf_context(invoice, tmpl)
     pdf_bytes = render_invoice_pdf(ctx)
     to_email = request.data.get("to") or invoice.customer.email
     if not to_email:
@@ -74,6 +73,47 @@ def send_invoice_email_view(request, pk:int):
     send_invoice_email(f"Facture {invoice.number}", "Veuillez trouver votre facture en pièce jointe.", to_email, pdf_bytes, f"{invoice.number}.pdf")
     return Response({"status":"sent"})
 
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def convert_quote_view(request, pk:int):
+    quote = get_object_or_404(Quote, pk=pk, organization=request_org(request))
+    invoice = convert_quote(quote)
+    return Response(InvoiceSerializer(invoice).data, status=201)
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def send_invoice_whatsapp_view(request, pk:int):
+    invoice = get_object_or_404(Invoice, pk=pk, organization=request_org(request))
+    org = invoice.organization
+    to_number = request.data.get("to") or invoice.customer.phone
+    if not to_number:
+        return Response({"detail":"Aucun numéro WhatsApp fourni."}, status=400)
+    if not org.whatsapp_phone_number_id:
+        return Response({"detail":"WhatsApp Cloud API non configuré pour cette organisation."}, status=400)
+    text = request.data.get("text") or f"Bonjour {invoice.customer.name}, votre facture {invoice.number} du {invoice.issue_date:%d/%m/%Y} est disponible."
+    msg = enqueue_whatsapp_message(org, to_number.lstrip("+"), text, invoice=invoice)
+    return Response({"status":"queued", "message_id": msg.id}, status=202)
+
+@api_view(["GET","POST"])
+@permission_classes([permissions.AllowAny])
+def whatsapp_webhook(request):
+    # Meta subscription handshake, then delivery status callbacks.
+    if request.method == "GET":
+        token = settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN
+        if token and request.GET.get("hub.mode") == "subscribe" and request.GET.get("hub.verify_token") == token:
+            return HttpResponse(request.GET.get("hub.challenge", ""))
+        return HttpResponse(status=403)
+    # Unsigned callbacks are never trusted: without the app secret there is nothing to check them against.
+    if not settings.WHATSAPP_APP_SECRET:
+        return HttpResponse(status=503)
+    expected = "sha256=" + hmac.new(settings.WHATSAPP_APP_SECRET.encode(), request.body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, request.headers.get("X-Hub-Signature-256", "")):
+        return HttpResponse(status=403)
+    statuses = [st for entry in request.data.get("entry", [])
+                for change in entry.get("changes", [])
+                for st in change.get("value", {}).get("statuses", [])]
+    return Response({"updated": apply_status_updates(statuses)})
+
 @api_view(["POST"])
 @permission_classes([permissions.AllowAny])
 def sync_view(request):
@@ -1,2 +1,9 @@
-from .celery import app as celery_app
+# The Celery app is loaded on first use rather than with every Django process: tasks modules
+# import it from config.celery, and `celery -A config` finds it there too.
+def __getattr__(name):
+    if name == "celery_app":
+        from .celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = ("celery_app",)
@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     "billing",
     "reports",
     "compliance",
+    "archive",
 ]
 
 MIDDLEWARE = [
@@ -67,6 +68,8 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
+MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "media"  # PDF de factures régénérés (billing.services.store_invoice_pdf)
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
@@ -96,6 +99,42 @@ EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "0") == "1"
 # Celery / Redis
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+# Shared between web and worker processes (per-sender WhatsApp flush locks)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL") or CELERY_BROKER_URL,
+    }
+}
+CELERY_BEAT_SCHEDULE = {
+    "whatsapp-outbox": {"task": "billing.tasks.dispatch_whatsapp_outbox", "schedule": timedelta(seconds=15)},
+    "recurring-invoices": {"task": "billing.tasks.generate_recurring_invoices", "schedule": timedelta(hours=1)},
+    "stock-valuation-checkpoints": {"task": "inventory.tasks.checkpoint_stock_valuation", "schedule": timedelta(days=1)},
+    "archive-cold-data": {"task": "archive.tasks.archive_cold_data", "schedule": timedelta(days=1)},
+}
+
+# WhatsApp Business Cloud API (outbound queue, see billing/outbox.py)
+WHATSAPP_API_BASE_URL = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com/v19.0")
+WHATSAPP_WEBHOOK_VERIFY_TOKEN = os.getenv("WHATSAPP_WEBHOOK_VERIFY_TOKEN", "")
+WHATSAPP_APP_SECRET = os.getenv("WHATSAPP_APP_SECRET", "")  # signs webhook payloads; the webhook rejects POSTs while unset
+WHATSAPP_RATE_PER_SECOND = float(os.getenv("WHATSAPP_RATE_PER_SECOND", "20"))  # per phone number id (one flush per sender at a time)
+WHATSAPP_BATCH_SIZE = 50
+WHATSAPP_FLUSH_SECONDS = 50
+WHATSAPP_SEND_CONCURRENCY = 4
+WHATSAPP_HTTP_POOL_SIZE = 10
+WHATSAPP_HTTP_TIMEOUT = 10.0
+WHATSAPP_MAX_ATTEMPTS = 8
+WHATSAPP_RETRY_BASE_SECONDS = 2
+WHATSAPP_RETRY_MAX_SECONDS = 900
+
+# Cold storage for archived invoices / stock movements (gzip JSONL segments)
+ARCHIVE_ROOT = Path(os.getenv("ARCHIVE_ROOT") or BASE_DIR / "archive_segments")
+
+# Cold-start regression check: `python manage.py startup_profile --check`
+STARTUP_BUDGETS = {
+    "wsgi": {"max_ms": 1500, "forbid": ["weasyprint", "celery"]},
+    "worker": {"max_ms": 2500, "forbid": ["weasyprint"]},
+}
 
 # Organization defaults
 DEFAULT_CURRENCY = "XOF"
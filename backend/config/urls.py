@@ -1,11 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from billing.views import InvoiceViewSet, CustomerViewSet, QuoteViewSet, PaymentViewSet, send_invoice_email_view, sync_view
+from billing.views import InvoiceViewSet, CustomerViewSet, QuoteViewSet, PaymentViewSet, OutboundMessageViewSet, RecurringInvoiceViewSet, send_invoice_email_view, convert_quote_view, send_invoice_whatsapp_view, whatsapp_webhook, sync_view
 from products.views import ProductViewSet, TaxViewSet, UnitViewSet
 from inventory.views import SupplierViewSet, StockMovementViewSet
 from accounts.views import UserViewSet, OrganizationViewSet, MembershipViewSet
-from reports.views import overview_metrics, sales_by_month, top_products, invoice_status_split, low_stock
+from reports.views import overview_metrics, sales_by_month, top_products, invoice_status_split, low_stock, stock_valuation, export_invoices
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
@@ -14,7 +14,9 @@ router.register(r'units', UnitViewSet, basename='unit')
 router.register(r'customers', CustomerViewSet, basename='customer')
 router.register(r'invoices', InvoiceViewSet, basename='invoice')
 router.register(r'quotes', QuoteViewSet, basename='quote')
+router.register(r'recurring-invoices', RecurringInvoiceViewSet, basename='recurringinvoice')
 router.register(r'payments', PaymentViewSet, basename='payment')
+router.register(r'messages', OutboundMessageViewSet, basename='outboundmessage')
 router.register(r'suppliers', SupplierViewSet, basename='supplier')
 router.register(r'stock-movements', StockMovementViewSet, basename='stockmovement')
 router.register(r'users', UserViewSet, basename='user')
@@ -29,6 +31,11 @@ urlpatterns = [
     path('api/reports/top_products', top_products),
     path('api/reports/invoice_status_split', invoice_status_split),
     path('api/reports/low_stock', low_stock),
+    path('api/reports/stock_valuation', stock_valuation),
+    path('api/exports/invoices', export_invoices),
     path('api/invoices/<int:pk>/send_email', send_invoice_email_view),
+    path('api/invoices/<int:pk>/send_whatsapp', send_invoice_whatsapp_view),
+    path('api/quotes/<int:pk>/convert', convert_quote_view),
+    path('api/webhooks/whatsapp', whatsapp_webhook),
     path('api/sync', sync_view),  # offline queue landing endpoint
 ]
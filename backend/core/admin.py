@@ -1,8 +1,53 @@
+import json
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from .models import Organization, Membership
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the PostgreSQL planner's row estimate instead of COUNT(*) once a changelist is large."""
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if connections[qs.db].vendor == "postgresql":
+            sql, params = qs.query.get_compiler(qs.db).as_sql()
+            with connections[qs.db].cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Changelists over tables with millions of rows: no exact counts, joined FKs, small pages.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def enqueue_in_chunks(self, request, task, queryset, label, chunk_size=1000):
+        # Ships primary keys to a Celery task in chunks so the request only reads ids.
+        ids, jobs, total = [], 0, 0
+        for pk in queryset.order_by().values_list("pk", flat=True).iterator(chunk_size=chunk_size):
+            ids.append(pk)
+            if len(ids) == chunk_size:
+                task.delay(ids)
+                jobs, total, ids = jobs + 1, total + len(ids), []
+        if ids:
+            task.delay(ids)
+            jobs, total = jobs + 1, total + len(ids)
+        self.message_user(request, f"{label} : {total} élément(s) en {jobs} tâche(s) d'arrière-plan.")
+
 @admin.register(Organization)
 class OrganizationAdmin(admin.ModelAdmin):
     list_display = ("name", "country_code", "currency", "tax_enabled", "default_tax_rate", "org_code")
+    search_fields = ("name", "org_code")
 @admin.register(Membership)
 class MembershipAdmin(admin.ModelAdmin):
     list_display = ("organization", "user", "role", "is_active")
+    list_select_related = ("organization", "user")
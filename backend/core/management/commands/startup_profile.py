@@ -0,0 +1,82 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each kind of process imports before it can serve its first request / task.
+TARGETS = {
+    "wsgi": "import config.wsgi; from django.urls import get_resolver; get_resolver().url_patterns",
+    "worker": "from config.celery import app; app.loader.import_default_modules()",
+    "manage": "import django; django.setup()",
+}
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def run_importtime(code):
+    """Runs `code` in a fresh interpreter under -X importtime; returns (wall_ms, {module: (self_us, cumulative_us)})."""
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings")}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=settings.BASE_DIR,
+                          env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))[-2000:]
+        raise CommandError(f"Échec du démarrage :\n{tail}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return wall_ms, modules
+
+def per_package(modules):
+    totals = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        totals[name.split(".", 1)[0]] += self_us
+    return totals
+
+class Command(BaseCommand):
+    help = "Mesure le temps de démarrage (WSGI, worker Celery, manage.py) et le temps d'import par application."
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="*", help=f"Parmi {', '.join(TARGETS)} (toutes par défaut)")
+        parser.add_argument("--repeat", type=int, default=3, help="Démarrages à froid par cible (le meilleur est retenu)")
+        parser.add_argument("--top", type=int, default=12)
+        parser.add_argument("--check", action="store_true",
+                            help="Échoue si STARTUP_BUDGETS (durée max, imports interdits) n'est pas respecté")
+
+    def handle(self, *args, **opts):
+        budgets = getattr(settings, "STARTUP_BUDGETS", {})
+        local_apps = {cfg.name.split(".", 1)[0] for cfg in apps.get_app_configs()
+                      if str(cfg.path).startswith(str(settings.BASE_DIR))} | {"config"}
+        unknown = set(opts["targets"]) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Cible inconnue : {', '.join(sorted(unknown))}")
+        failures = []
+        for target in opts["targets"] or list(TARGETS):
+            runs = [run_importtime(TARGETS[target]) for _ in range(max(opts["repeat"], 1))]
+            wall_ms, modules = min(runs, key=lambda r: r[0])
+            totals = per_package(modules)
+            import_ms = sum(totals.values()) / 1000
+            self.stdout.write(f"{target}: {wall_ms:.0f} ms au total, {import_ms:.0f} ms d'imports, {len(modules)} modules")
+            for name, us in sorted(totals.items(), key=lambda kv: -kv[1])[:opts["top"]]:
+                kind = "app" if name in local_apps else "dép."
+                self.stdout.write(f"  {name:<28} {us / 1000:>8.1f} ms  ({kind})")
+
+            budget = budgets.get(target, {})
+            if budget.get("max_ms") and wall_ms > budget["max_ms"]:
+                failures.append(f"{target}: {wall_ms:.0f} ms > {budget['max_ms']} ms")
+            loaded = sorted(m for m in budget.get("forbid", []) if m in modules)
+            if loaded:
+                failures.append(f"{target}: imports interdits au démarrage : {', '.join(loaded)}")
+
+        if opts["check"] and failures:
+            raise CommandError("Budget de démarrage dépassé :\n" + "\n".join(failures))
+        for failure in failures:
+            self.stderr.write(failure)
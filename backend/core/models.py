@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 
 class Organization(models.Model):
+    VALUATION_CHOICES = [("WAVG","Coût moyen pondéré"),("FIFO","FIFO / PEPS")]
     name = models.CharField(max_length=200)
     org_code = models.SlugField(unique=True)  # pour sous-domaine / routing
     country_code = models.CharField(max_length=2, default="BJ")
@@ -12,6 +13,10 @@ class Organization(models.Model):
     tax_enabled = models.BooleanField(default=True)
     default_tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=18)  # %
     whatsapp_number = models.CharField(max_length=32, blank=True)  # pour Click-to-Chat
+    whatsapp_phone_number_id = models.CharField(max_length=64, blank=True)  # WhatsApp Cloud API
+    whatsapp_access_token = models.TextField(blank=True)
+    valuation_method = models.CharField(max_length=4, choices=VALUATION_CHOICES, default="WAVG")  # stocks
+    archive_after_months = models.PositiveSmallIntegerField(default=0)  # 0 = pas d'archivage
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self):
         return self.name
@@ -1,3 +1,5 @@
+from django.utils.dateparse import parse_date
+
 def request_org(request):
     org = getattr(request, "organization", None)
     if not org:
@@ -5,3 +7,10 @@ def request_org(request):
         from .models import Organization
         org = Organization.objects.first()
     return org
+
+def parse_day(value):
+    """YYYY-MM-DD as a date, or None if malformed or not a real day (parse_date raises on 2026-02-30)."""
+    try:
+        return parse_date(value or "")
+    except ValueError:
+        return None
@@ -1,4 +1,42 @@
 from django.contrib import admin
+from django.db.models import Min
+from core.admin import LargeTableAdmin
 from .models import Supplier, StockMovement
-admin.site.register(Supplier)
-admin.site.register(StockMovement)
+from .valuation import invalidate_checkpoints
+
+@admin.register(Supplier)
+class SupplierAdmin(admin.ModelAdmin):
+    list_display = ("name", "contact_email", "phone", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization",)
+    search_fields = ("name",)
+
+@admin.register(StockMovement)
+class StockMovementAdmin(LargeTableAdmin):
+    list_display = ("occurred_at", "product", "mov_type", "quantity", "unit_cost", "ref", "organization")
+    list_select_related = ("product", "organization")
+    list_filter = ("organization", "mov_type", ("occurred_at", admin.DateFieldListFilter))  # (organization, occurred_at) index
+    search_fields = ("=ref",)
+    autocomplete_fields = ("product",)
+    ordering = ("-occurred_at",)
+    actions = ["recompute_stock"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            invalidate_checkpoints(obj.organization, obj.occurred_at)
+
+    def delete_model(self, request, obj):
+        invalidate_checkpoints(obj.organization, obj.occurred_at)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for row in queryset.order_by().values("organization").annotate(since=Min("occurred_at")):
+            invalidate_checkpoints(row["organization"], row["since"])
+        super().delete_queryset(request, queryset)
+
+    @admin.action(description="Recalculer la valorisation du stock (arrière-plan)")
+    def recompute_stock(self, request, queryset):
+        from .tasks import enqueue_recompute
+        jobs = enqueue_recompute(queryset)
+        self.message_user(request, f"Recalcul du stock : {jobs} tâche(s) d'arrière-plan.")
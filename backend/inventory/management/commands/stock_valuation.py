@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Organization
+from core.utils import parse_day
+from inventory.models import StockMovement
+from inventory.valuation import METHODS, build_checkpoints, end_of_day, valuation_report
+
+def period_ends(first, last, period):
+    """Last day of every day/week/month period between two dates (inclusive)."""
+    day = first
+    while day <= last:
+        if period == "day":
+            end = day
+        elif period == "week":
+            end = day + timedelta(days=6 - day.weekday())
+        else:
+            end = (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        yield min(end, last)
+        day = end + timedelta(days=1)
+
+class Command(BaseCommand):
+    help = "Valorisation du stock (coût moyen pondéré ou FIFO) et création des points de reprise."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", help="org_code (toutes les organisations par défaut)")
+        parser.add_argument("--as-of", help="YYYY-MM-DD (aujourd'hui par défaut)")
+        parser.add_argument("--from", dest="since", help="YYYY-MM-DD : coût des ventes à partir de cette date")
+        parser.add_argument("--method", choices=METHODS, help="Méthode de l'organisation par défaut")
+        parser.add_argument("--checkpoint", choices=["day", "week", "month"],
+                            help="Enregistre un point de reprise à la fin de chaque période jusqu'à --as-of")
+
+    def handle(self, *args, **opts):
+        orgs = Organization.objects.all()
+        if opts["org"]:
+            orgs = orgs.filter(org_code=opts["org"])
+            if not orgs.exists():
+                raise CommandError(f"Organisation inconnue : {opts['org']}")
+        as_of = parse_day(opts["as_of"]) if opts["as_of"] else timezone.localdate()
+        since = parse_day(opts["since"]) if opts["since"] else None
+        if as_of is None or (opts["since"] and since is None):
+            raise CommandError("Date invalide, format attendu YYYY-MM-DD.")
+
+        for org in orgs:
+            method = opts["method"] or org.valuation_method
+            if opts["checkpoint"]:
+                first = (StockMovement.objects.filter(organization=org)
+                         .order_by("occurred_at").values_list("occurred_at", flat=True).first())
+                if first is None:
+                    continue
+                # Today's period is still open; its checkpoint would be invalidated by tomorrow's run.
+                last = min(as_of, timezone.localdate() - timedelta(days=1))
+                cutoffs = [end_of_day(d) for d in period_ends(timezone.localtime(first).date(), last, opts["checkpoint"])]
+                created = build_checkpoints(org, cutoffs, method=method)
+                self.stdout.write(f"{org.org_code}: {len(created)} point(s) de reprise {method}")
+                continue
+
+            report = valuation_report(org, as_of=end_of_day(as_of), method=method,
+                                      since=end_of_day(since - timedelta(days=1)) if since else None)
+            self.stdout.write(f"{org.org_code} — {method} au {as_of:%Y-%m-%d}")
+            for row in report["products"]:
+                self.stdout.write(f"  {row['sku']:<16} {row['quantity']:>12} x {row['unit_cost']:>12} = {row['value']:>14}   CMV {row['cogs']:>14}")
+            self.stdout.write(f"  Valeur du stock : {report['total_value']}   Coût des ventes : {report['total_cogs']}")
@@ -14,6 +14,29 @@ class StockMovement(OrgScopedModel):
     MOV_TYPES = [(IN,"IN"),(OUT,"OUT"),(ADJUST,"ADJUST")]
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     mov_type = models.CharField(max_length=10, choices=MOV_TYPES)
-    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)  # ADJUST: signed
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)  # entrées uniquement
     ref = models.CharField(max_length=100, blank=True)
     occurred_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization","product","occurred_at"]),
+            models.Index(fields=["organization","occurred_at"]),
+        ]
+
+class ValuationCheckpoint(OrgScopedModel):
+    # Snapshot of every product's valuation state after all movements with occurred_at <= as_of.
+    method = models.CharField(max_length=4)  # WAVG, FIFO
+    as_of = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        unique_together = ("organization","method","as_of")
+
+class ValuationCheckpointLine(models.Model):
+    checkpoint = models.ForeignKey(ValuationCheckpoint, related_name="lines", on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2)
+    value = models.DecimalField(max_digits=20, decimal_places=6)
+    cogs = models.DecimalField(max_digits=20, decimal_places=6)  # cumulé depuis l'origine
+    last_cost = models.DecimalField(max_digits=16, decimal_places=6, default=0)
+    layers = models.JSONField(default=list, blank=True)  # FIFO: [[qty, unit_cost], ...]
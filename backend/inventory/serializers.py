@@ -10,3 +10,7 @@ class StockMovementSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockMovement
         fields = "__all__"
+    def validate_unit_cost(self, value):
+        if value is not None and value < 0:
+            raise serializers.ValidationError("Le coût unitaire doit être positif.")
+        return value
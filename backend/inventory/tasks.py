@@ -0,0 +1,28 @@
+from datetime import datetime, time
+from config.celery import app
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import Organization
+from .valuation import build_checkpoints, invalidate_checkpoints
+
+@app.task(ignore_result=True)
+def checkpoint_stock_valuation():
+    # Snapshot every org at last midnight; each run only replays the previous day's movements.
+    cutoff = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    for org in Organization.objects.all().iterator():
+        build_checkpoints(org, [cutoff])
+
+@app.task(ignore_result=True)
+def recompute_stock(org_id, since):
+    # Drops the checkpoints from `since` on (ISO datetime) and rebuilds last midnight's.
+    org = Organization.objects.get(pk=org_id)
+    invalidate_checkpoints(org, parse_datetime(since))
+    build_checkpoints(org, [timezone.make_aware(datetime.combine(timezone.localdate(), time.min))])
+
+def enqueue_recompute(movements):
+    """One background rebuild per organization, from the earliest affected movement; returns the job count."""
+    rows = movements.order_by().values("organization").annotate(since=Min("occurred_at"))
+    for row in rows:
+        recompute_stock.delay(row["organization"], row["since"].isoformat())
+    return len(rows)
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import Organization
+from products.models import Product
+from .models import StockMovement, ValuationCheckpoint, ValuationCheckpointLine
+from .valuation import FIFO, WAVG, FifoState, WeightedAverageState, apply_movement, build_checkpoints, end_of_day, valuate
+
+D = Decimal
+
+def replay(state, movements):
+    for mov_type, quantity, unit_cost in movements:
+        apply_movement(state, mov_type, D(quantity), None if unit_cost is None else D(unit_cost))
+    return state
+
+class WeightedAverageTests(TestCase):
+    def test_mixed_receipts_and_issues(self):
+        state = replay(WeightedAverageState(), [("IN", 10, 5), ("IN", 10, 8), ("OUT", 5, None)])
+        self.assertEqual((state.quantity, state.value, state.cogs), (D(15), D("97.5"), D("32.5")))
+        replay(state, [("IN", 5, 10), ("OUT", 20, None)])
+        self.assertEqual((state.quantity, state.value, state.cogs), (D(0), D(0), D(180)))
+
+    def test_receipt_without_cost_uses_last_cost(self):
+        state = replay(WeightedAverageState(), [("IN", 4, 3), ("ADJUST", 2, None)])
+        self.assertEqual((state.quantity, state.value), (D(6), D(18)))
+
+class FifoTests(TestCase):
+    def test_issues_consume_oldest_layers_first(self):
+        state = replay(FifoState(), [("IN", 10, 5), ("IN", 5, 8), ("OUT", 12, None)])
+        self.assertEqual(state.cogs, D(66))
+        self.assertEqual(list(state.layers), [[D(3), D(8)]])
+
+    def test_oversold_position_is_refilled_by_the_next_receipt(self):
+        state = replay(FifoState(), [("IN", 10, 5), ("IN", 5, 8), ("OUT", 12, None), ("OUT", 5, None)])
+        self.assertEqual(state.cogs, D(106))  # 3 from the last layer, 2 oversold at its cost
+        self.assertEqual(list(state.layers), [[D(-2), D(8)]])
+        replay(state, [("IN", 6, 9)])
+        self.assertEqual(list(state.layers), [[D(4), D(9)]])
+        self.assertEqual((state.quantity, state.value, state.cogs), (D(4), D(36), D(106)))
+
+class CheckpointTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name="Boutique", org_code="boutique")
+        self.rice = Product.objects.create(organization=self.org, sku="RIZ", name="Riz", unit_price=10)
+        self.oil = Product.objects.create(organization=self.org, sku="HUILE", name="Huile", unit_price=10)
+        for product, mov_type, quantity, unit_cost, day in (
+            (self.rice, "IN", 10, 5, date(2026, 1, 10)),
+            (self.rice, "OUT", 3, None, date(2026, 1, 20)),
+            (self.rice, "IN", 6, 7, date(2026, 2, 5)),
+            (self.oil, "IN", 8, 2, date(2026, 2, 12)),  # first oil movement after the January cut-off
+            (self.rice, "OUT", 9, None, date(2026, 2, 25)),
+            (self.oil, "OUT", 10, None, date(2026, 3, 3)),
+            (self.rice, "IN", 4, 6, date(2026, 3, 18)),
+            (self.oil, "IN", 5, 3, date(2026, 3, 20)),
+        ):
+            movement = StockMovement.objects.create(organization=self.org, product=product, mov_type=mov_type,
+                                                    quantity=quantity, unit_cost=unit_cost)
+            StockMovement.objects.filter(pk=movement.pk).update(occurred_at=end_of_day(day) - timedelta(hours=12))
+
+    def snapshot(self, states):
+        return {pid: (st.quantity.quantize(D("0.01")), st.value.quantize(D("0.01")), st.cogs.quantize(D("0.01")))
+                for pid, st in states.items()}
+
+    def test_resuming_from_checkpoints_matches_a_full_replay(self):
+        days = [date(2026, 1, 31), date(2026, 2, 20), date(2026, 3, 10), date(2026, 3, 31)]
+        for method in (WAVG, FIFO):
+            full = {day: self.snapshot(valuate(self.org, as_of=end_of_day(day), method=method)) for day in days}
+            build_checkpoints(self.org, [end_of_day(date(2026, 1, 31)), end_of_day(date(2026, 2, 28))], method=method)
+            for day in days:
+                self.assertEqual(self.snapshot(valuate(self.org, as_of=end_of_day(day), method=method)), full[day],
+                                 f"{method} {day}")
+
+    def test_no_checkpoint_line_before_a_products_first_movement(self):
+        january, february = build_checkpoints(self.org, [end_of_day(date(2026, 1, 31)), end_of_day(date(2026, 2, 28))],
+                                              method=WAVG)
+        self.assertEqual(list(january.lines.values_list("product_id", flat=True)), [self.rice.pk])
+        self.assertEqual(set(february.lines.values_list("product_id", flat=True)), {self.rice.pk, self.oil.pk})
+        self.assertEqual(ValuationCheckpoint.objects.count(), 2)
+        self.assertEqual(ValuationCheckpointLine.objects.count(), 3)
@@ -0,0 +1,259 @@
+"""Stock valuation (weighted average cost or FIFO) in one streaming pass over movements.
+
+Movements are read ordered by (product, occurred_at, id), so only one product's state is
+held in memory at a time. Persisted checkpoints snapshot every product at a cut-off date;
+valuing stock as of a date starts from the nearest earlier checkpoint and only replays the
+movements recorded after it.
+"""
+from collections import deque
+from datetime import datetime, time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from archive.store import archived_movement_streams, merge_movements
+from products.models import Product
+
+from .models import StockMovement, ValuationCheckpoint, ValuationCheckpointLine
+
+ZERO = Decimal("0")
+WAVG, FIFO = "WAVG", "FIFO"
+METHODS = (WAVG, FIFO)
+
+def end_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.max))
+
+def signed_quantity(mov_type, quantity):
+    if mov_type == StockMovement.OUT:
+        return -abs(quantity)
+    if mov_type == StockMovement.IN:
+        return abs(quantity)
+    return quantity  # ADJUST carries its own sign
+
+@dataclass
+class WeightedAverageState:
+    quantity: Decimal = ZERO
+    value: Decimal = ZERO
+    cogs: Decimal = ZERO
+    last_cost: Decimal = ZERO
+
+    def receive(self, qty, unit_cost):
+        cost = self.last_cost if unit_cost is None else unit_cost
+        self.quantity += qty
+        self.value += qty * cost
+        self.last_cost = cost
+
+    def issue(self, qty):
+        avg = self.value / self.quantity if self.quantity > 0 else self.last_cost
+        self.quantity -= qty
+        self.value -= qty * avg
+        self.cogs += qty * avg
+        self.last_cost = avg
+        if self.quantity == 0:
+            self.value = ZERO  # drop rounding residue once the shelf is empty
+
+    def dump(self):
+        return {"layers": []}
+
+    @classmethod
+    def load(cls, line):
+        return cls(quantity=line.quantity, value=line.value, cogs=line.cogs, last_cost=line.last_cost)
+
+@dataclass
+class FifoState:
+    layers: deque = field(default_factory=deque)  # [qty, unit_cost]; a single negative layer when oversold
+    cogs: Decimal = ZERO
+    last_cost: Decimal = ZERO
+
+    @property
+    def quantity(self):
+        return sum((q for q, _ in self.layers), ZERO)
+
+    @property
+    def value(self):
+        return sum((q * c for q, c in self.layers), ZERO)
+
+    def receive(self, qty, unit_cost):
+        cost = self.last_cost if unit_cost is None else unit_cost
+        self.last_cost = cost
+        if self.layers and self.layers[0][0] < 0:
+            # Refill an oversold position first; those issues were already costed at last_cost.
+            backlog = self.layers[0][0] + qty
+            if backlog <= 0:
+                self.layers[0][0] = backlog
+                if backlog == 0:
+                    self.layers.popleft()
+                return
+            self.layers.popleft()
+            qty = backlog
+        self.layers.append([qty, cost])
+
+    def issue(self, qty):
+        while qty > 0 and self.layers and self.layers[0][0] > 0:
+            layer = self.layers[0]
+            take = min(qty, layer[0])
+            self.cogs += take * layer[1]
+            self.last_cost = layer[1]
+            layer[0] -= take
+            qty -= take
+            if layer[0] == 0:
+                self.layers.popleft()
+        if qty > 0:
+            self.cogs += qty * self.last_cost
+            if self.layers:
+                self.layers[0][0] -= qty
+            else:
+                self.layers.append([-qty, self.last_cost])
+
+    def dump(self):
+        return {"layers": [[str(q), str(c)] for q, c in self.layers]}
+
+    @classmethod
+    def load(cls, line):
+        layers = deque([Decimal(q), Decimal(c)] for q, c in line.layers)
+        return cls(layers=layers, cogs=line.cogs, last_cost=line.last_cost)
+
+STATE_CLASSES = {WAVG: WeightedAverageState, FIFO: FifoState}
+
+def apply_movement(state, mov_type, quantity, unit_cost):
+    qty = signed_quantity(mov_type, quantity)
+    if qty > 0:
+        state.receive(qty, unit_cost)
+    elif qty < 0:
+        state.issue(-qty)
+
+def latest_checkpoint(org, method, as_of=None):
+    qs = ValuationCheckpoint.objects.filter(organization=org, method=method)
+    if as_of is not None:
+        qs = qs.filter(as_of__lte=as_of)
+    return qs.order_by("-as_of").first()
+
+def load_states(checkpoint, method):
+    if checkpoint is None:
+        return {}
+    cls = STATE_CLASSES[method]
+    return {line.product_id: cls.load(line) for line in checkpoint.lines.all().iterator(chunk_size=2000)}
+
+def stream_movements(org, after=None, until=None, product_ids=None):
+    """Yields (product_id, rows) groups ordered by (product, occurred_at, id)."""
+    qs = StockMovement.objects.filter(organization=org)
+    if after is not None:
+        qs = qs.filter(occurred_at__gt=after)
+    if until is not None:
+        qs = qs.filter(occurred_at__lte=until)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    rows = (qs.order_by("product_id", "occurred_at", "id")
+            .values_list("product_id", "occurred_at", "mov_type", "quantity", "unit_cost")
+            .iterator(chunk_size=2000))
+    archived = archived_movement_streams(org, after=after, until=until, product_ids=product_ids)
+    if archived:
+        # Movements moved to cold storage are replayed from their segments, interleaved in order.
+        rows = merge_movements(rows, *archived)
+    return groupby(rows, key=itemgetter(0))
+
+def valuate(org, as_of=None, method=None, product_ids=None):
+    """Returns {product_id: state} for stock on hand as of `as_of` (None = now)."""
+    method = method or org.valuation_method
+    checkpoint = latest_checkpoint(org, method, as_of)
+    states = load_states(checkpoint, method)
+    if product_ids is not None:
+        wanted = set(product_ids)
+        states = {pid: st for pid, st in states.items() if pid in wanted}
+    cls = STATE_CLASSES[method]
+    after = checkpoint.as_of if checkpoint else None
+    for product_id, rows in stream_movements(org, after=after, until=as_of, product_ids=product_ids):
+        state = states.get(product_id) or cls()
+        for _, _, mov_type, quantity, unit_cost in rows:
+            apply_movement(state, mov_type, quantity, unit_cost)
+        states[product_id] = state
+    return states
+
+def _line(checkpoint, product_id, state):
+    return ValuationCheckpointLine(
+        checkpoint=checkpoint, product_id=product_id, quantity=state.quantity, value=state.value,
+        cogs=state.cogs, last_cost=state.last_cost, **state.dump(),
+    )
+
+def build_checkpoints(org, cutoffs, method=None, batch_size=2000):
+    """Persists a checkpoint at each cut-off in one pass; returns the checkpoints created.
+
+    The pass starts from the newest existing checkpoint before the first cut-off, so
+    scheduled runs only read the movements recorded since the previous one.
+    """
+    method = method or org.valuation_method
+    cutoffs = sorted(set(cutoffs))
+    if not cutoffs:
+        return []
+    base = (ValuationCheckpoint.objects.filter(organization=org, method=method, as_of__lt=cutoffs[0])
+            .order_by("-as_of").first())
+    base_states = load_states(base, method)
+    cls = STATE_CLASSES[method]
+    with transaction.atomic():
+        ValuationCheckpoint.objects.filter(organization=org, method=method, as_of__in=cutoffs).delete()
+        checkpoints = [ValuationCheckpoint.objects.create(organization=org, method=method, as_of=c) for c in cutoffs]
+        buffer = []
+        def emit(product_id, state, upto):
+            for cp in checkpoints[upto[0]:upto[1]]:
+                buffer.append(_line(cp, product_id, state))
+            if len(buffer) >= batch_size:
+                ValuationCheckpointLine.objects.bulk_create(buffer)
+                buffer.clear()
+        after = base.as_of if base else None
+        for product_id, rows in stream_movements(org, after=after, until=cutoffs[-1]):
+            state = base_states.pop(product_id, None)
+            # Cut-offs before a product's first movement get no line, same as valuate() returning no state for it.
+            has_history = state is not None
+            state = state or cls()
+            k = 0
+            for _, occurred_at, mov_type, quantity, unit_cost in rows:
+                start = k
+                while k < len(cutoffs) and occurred_at > cutoffs[k]:
+                    k += 1
+                if k > start and has_history:
+                    emit(product_id, state, (start, k))
+                apply_movement(state, mov_type, quantity, unit_cost)
+                has_history = True
+            emit(product_id, state, (k, len(cutoffs)))
+        for product_id, state in base_states.items():  # no movement since the base checkpoint
+            emit(product_id, state, (0, len(cutoffs)))
+        ValuationCheckpointLine.objects.bulk_create(buffer)
+    return checkpoints
+
+def invalidate_checkpoints(org, since):
+    # Checkpoints at or after a changed movement no longer reflect history.
+    return ValuationCheckpoint.objects.filter(organization=org, as_of__gte=since).delete()
+
+def valuation_report(org, as_of=None, method=None, since=None):
+    """Per-product quantity, value and COGS as of `as_of`; COGS covers (since, as_of] when given."""
+    method = method or org.valuation_method
+    states = valuate(org, as_of=as_of, method=method)
+    opening = valuate(org, as_of=since, method=method) if since is not None else {}
+    products = {pid: (sku, name) for pid, sku, name in Product.objects.filter(id__in=states.keys()).values_list("id", "sku", "name")}
+    rows = []
+    for product_id in sorted(states, key=lambda pid: products.get(pid, ("", ""))):
+        st = states[product_id]
+        sku, name = products.get(product_id, ("", ""))
+        cogs = st.cogs - (opening[product_id].cogs if product_id in opening else ZERO)
+        qty = st.quantity
+        rows.append({
+            "product": product_id,
+            "sku": sku,
+            "name": name,
+            "quantity": qty,
+            "unit_cost": (st.value / qty).quantize(Decimal("0.0001")) if qty else st.last_cost,
+            "value": st.value.quantize(Decimal("0.01")),
+            "cogs": cogs.quantize(Decimal("0.01")),
+        })
+    return {
+        "method": method,
+        "as_of": as_of,
+        "since": since,
+        "total_value": sum((r["value"] for r in rows), ZERO),
+        "total_cogs": sum((r["cogs"] for r in rows), ZERO),
+        "products": rows,
+    }
@@ -2,6 +2,7 @@ from rest_framework import viewsets, permissions
 from core.utils import request_org
 from .models import Supplier, StockMovement
 from .serializers import SupplierSerializer, StockMovementSerializer
+from .valuation import invalidate_checkpoints
 
 class OrgScopedViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
@@ -19,3 +20,9 @@ class StockMovementViewSet(OrgScopedViewSet):
     queryset = StockMovement.objects.all()
     serializer_class = StockMovementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_checkpoints(serializer.instance.organization, serializer.instance.occurred_at)
+    def perform_destroy(self, instance):
+        invalidate_checkpoints(instance.organization, instance.occurred_at)
+        super().perform_destroy(instance)
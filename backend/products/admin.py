@@ -1,5 +1,33 @@
 from django.contrib import admin
+from core.admin import LargeTableAdmin
 from .models import Product, Tax, UnitOfMeasure
-admin.site.register(Product)
-admin.site.register(Tax)
-admin.site.register(UnitOfMeasure)
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ("sku", "name", "organization", "unit_price", "currency", "uom", "is_active")
+    list_select_related = ("organization", "uom")
+    list_filter = ("organization", "is_active")
+    search_fields = ("^sku", "name")
+    autocomplete_fields = ("uom", "tax")
+    actions = ["recompute_stock"]
+
+    @admin.action(description="Recalculer la valorisation du stock (arrière-plan)")
+    def recompute_stock(self, request, queryset):
+        from inventory.models import StockMovement
+        from inventory.tasks import enqueue_recompute
+        jobs = enqueue_recompute(StockMovement.objects.filter(product__in=queryset))
+        self.message_user(request, f"Recalcul du stock : {jobs} tâche(s) d'arrière-plan.")
+
+@admin.register(Tax)
+class TaxAdmin(admin.ModelAdmin):
+    list_display = ("name", "rate", "is_inclusive", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization",)
+    search_fields = ("name",)
+
+@admin.register(UnitOfMeasure)
+class UnitOfMeasureAdmin(admin.ModelAdmin):
+    list_display = ("code", "label", "organization")
+    list_select_related = ("organization",)
+    list_filter = ("organization",)
+    search_fields = ("code", "label")
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from core.models import Organization
+from inventory.models import StockMovement
+from inventory.valuation import end_of_day
+from products.models import Product
+
+class ReportDateParamTests(TestCase):
+    def setUp(self):
+        Organization.objects.create(name="Boutique", org_code="boutique")
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("gerant", password="x"))
+
+    def test_stock_valuation_rejects_invalid_dates(self):
+        for query in ("as_of=2026-02-30", "as_of=foo", "from=2026-13-01"):
+            self.assertEqual(self.client.get(f"/api/reports/stock_valuation?{query}").status_code, 400, query)
+        self.assertEqual(self.client.get("/api/reports/stock_valuation?as_of=2026-02-28").status_code, 200)
+
+    def test_invoice_export_rejects_invalid_dates(self):
+        for query in ("from=2026-02-30", "to=foo"):
+            self.assertEqual(self.client.get(f"/api/exports/invoices?{query}").status_code, 400, query)
+
+    def test_stock_valuation_cogs_includes_the_from_day(self):
+        org = Organization.objects.get()
+        product = Product.objects.create(organization=org, sku="RIZ", name="Riz", unit_price=10)
+        for mov_type, quantity, unit_cost, day in (("IN", 10, 5, date(2026, 2, 20)), ("OUT", 4, None, date(2026, 3, 1)),
+                                                   ("OUT", 1, None, date(2026, 3, 15))):
+            movement = StockMovement.objects.create(organization=org, product=product, mov_type=mov_type,
+                                                    quantity=quantity, unit_cost=unit_cost)
+            StockMovement.objects.filter(pk=movement.pk).update(occurred_at=end_of_day(day) - timedelta(hours=12))
+        response = self.client.get("/api/reports/stock_valuation?as_of=2026-03-31&from=2026-03-01")
+        self.assertEqual(response.json()["total_cogs"], 25.0)
+        response = self.client.get("/api/reports/stock_valuation?as_of=2026-03-31&from=2026-03-02")
+        self.assertEqual(response.json()["total_cogs"], 5.0)
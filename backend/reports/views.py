@@ -1,12 +1,36 @@
+import csv
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from core.utils import parse_day, request_org
 from billing.models import Invoice, InvoiceLine
+from archive.models import InvoiceRollup, ProductSalesRollup
+from archive.store import iter_archived_invoices
+from inventory.valuation import METHODS, end_of_day, valuation_report
 from products.models import Product
 from django.db.models import Sum, F, Value as V
 from django.db.models.functions import TruncMonth
 
+def include_archived(request):
+    # Archived months are only read on request (?include_archived=1), from rollups or segment files.
+    return request.GET.get("include_archived") in ("1", "true", "yes")
+
+def query_date(request, name):
+    """`?name=YYYY-MM-DD` as a date, None when absent; malformed or impossible dates are a 400."""
+    raw = request.GET.get(name)
+    if not raw:
+        return None
+    value = parse_day(raw)
+    if value is None:
+        raise ValidationError({name: "Date invalide, format attendu YYYY-MM-DD."})
+    return value
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def overview_metrics(request):
@@ -32,8 +56,13 @@ def sales_by_month(request):
           .values("month")
           .annotate(revenue=Sum(F("quantity")*F("unit_price")))
           .order_by("month"))
-    data = [{"month": (row["month"].strftime("%Y-%m") if row["month"] else "N/A"), "revenue": float(row["revenue"] or 0)} for row in qs]
-    return Response(data)
+    revenue = defaultdict(float)
+    for row in qs:
+        revenue[row["month"].strftime("%Y-%m") if row["month"] else "N/A"] += float(row["revenue"] or 0)
+    if include_archived(request):
+        for row in InvoiceRollup.objects.values("month").annotate(revenue=Sum("revenue")):
+            revenue[row["month"].strftime("%Y-%m")] += float(row["revenue"] or 0)
+    return Response([{"month": month, "revenue": value} for month, value in sorted(revenue.items())])
 
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
@@ -41,17 +70,88 @@ def top_products(request):
     qs = (InvoiceLine.objects
           .values("product__name")
           .annotate(revenue=Sum(F("quantity")*F("unit_price")))
-          .order_by("-revenue")[:5])
-    return Response([{"name": row["product__name"] or "N/A", "revenue": float(row["revenue"] or 0)} for row in qs])
+          .order_by("-revenue"))
+    if not include_archived(request):
+        return Response([{"name": row["product__name"] or "N/A", "revenue": float(row["revenue"] or 0)} for row in qs[:5]])
+    revenue = defaultdict(float)
+    for row in qs:
+        revenue[row["product__name"] or "N/A"] += float(row["revenue"] or 0)
+    for row in ProductSalesRollup.objects.values("product_name").annotate(revenue=Sum("revenue")):
+        revenue[row["product_name"] or "N/A"] += float(row["revenue"] or 0)
+    top = sorted(revenue.items(), key=lambda item: -item[1])[:5]
+    return Response([{"name": name, "revenue": value} for name, value in top])
 
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def invoice_status_split(request):
     qs = (Invoice.objects.values("status").annotate(count=Sum(V(1))).order_by())
-    return Response([{"status": row["status"], "value": int(row["count"])} for row in qs])
+    counts = defaultdict(int)
+    for row in qs:
+        counts[row["status"]] += int(row["count"])
+    if include_archived(request):
+        for row in InvoiceRollup.objects.values("status").annotate(count=Sum("invoice_count")).order_by():
+            counts[row["status"]] += int(row["count"])
+    return Response([{"status": status, "value": value} for status, value in counts.items()])
 
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
 def low_stock(request):
     # placeholder; implement your own stock level logic
     return Response([])
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def stock_valuation(request):
+    # ?as_of=YYYY-MM-DD (fin de journée), ?from=YYYY-MM-DD pour le coût des ventes de la période, ?method=WAVG|FIFO
+    org = request_org(request)
+    method = request.GET.get("method") or org.valuation_method
+    if method not in METHODS:
+        return Response({"detail": "Méthode inconnue (WAVG ou FIFO)."}, status=400)
+    as_of = query_date(request, "as_of")
+    since = query_date(request, "from")
+    # The opening valuation is taken at the end of the day before `from`, so that day's issues count in COGS.
+    report = valuation_report(org, as_of=end_of_day(as_of) if as_of else None, method=method,
+                              since=end_of_day(since - timedelta(days=1)) if since else None)
+    return Response({
+        "method": report["method"],
+        "as_of": as_of,
+        "from": since,
+        "total_value": float(report["total_value"]),
+        "total_cogs": float(report["total_cogs"]),
+        "products": [{**row, "quantity": float(row["quantity"]), "unit_cost": float(row["unit_cost"]),
+                      "value": float(row["value"]), "cogs": float(row["cogs"])} for row in report["products"]],
+    })
+
+class _Echo:
+    def write(self, value):
+        return value
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated])
+def export_invoices(request):
+    # CSV streamed row by row; ?from / ?to (YYYY-MM-DD), ?include_archived=1 to add archived invoices.
+    org = request_org(request)
+    start = query_date(request, "from")
+    end = query_date(request, "to")
+    qs = Invoice.objects.filter(organization=org)
+    if start:
+        qs = qs.filter(issue_date__gte=start)
+    if end:
+        qs = qs.filter(issue_date__lte=end)
+    qs = (qs.annotate(total=Sum(F("lines__quantity")*F("lines__unit_price")))
+          .order_by("issue_date", "id")
+          .values_list("number", "issue_date", "customer__name", "status", "currency", "total"))
+
+    def rows():
+        yield ["number", "issue_date", "customer", "status", "currency", "total", "archived"]
+        for number, issue_date, customer, status, currency, total in qs.iterator(chunk_size=2000):
+            yield [number, issue_date.isoformat(), customer, status, currency, f"{Decimal(total or 0):.2f}", 0]
+        if include_archived(request):
+            for inv in iter_archived_invoices(org, start, end):
+                total = sum((Decimal(l["quantity"]) * Decimal(l["unit_price"]) for l in inv["lines"]), Decimal(0))
+                yield [inv["number"], inv["issue_date"], inv["customer_name"], inv["status"], inv["currency"], f"{total:.2f}", 1]
+
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows()), content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="factures.csv"'
+    return response